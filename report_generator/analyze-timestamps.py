@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+
+#  Copyright (c) 2026, Arm Limited, All Rights Reserved
+#  SPDX-License-Identifier: Apache-2.0
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+#  This file is part of Mbed TLS (https://www.trustedfirmware.org/projects/mbed-tls/)
+
+"""
+Reports where the CI capacity goes, from the timestamps-bundle.csv or
+timestamps-bundle.json files archived by the gather-timestamps job:
+the critical path of each build, the queue wait (innerStart - start) of
+the jobs of each node label, the executor utilisation of each label over
+time and the jobs that take the most wall clock time.
+"""
+
+import argparse
+import bisect
+import collections
+import csv
+import sys
+
+import timestamps_bundle
+from timestamps_bundle import UNSET, format_duration
+
+MAIN_GROUP = "main"
+
+
+def task_name(subtask):
+    return "{}:{}".format(subtask.group, subtask.subtask)
+
+
+class TimestampsAnalyzer(object):
+    """Accumulates the statistics of the builds of a bundle, one build at a
+    time."""
+
+    def __init__(self, bucket_seconds, longest_builds):
+        self.bucket_ms = bucket_seconds * 1000
+        self.longest_builds_count = longest_builds
+        self.build_count = 0
+        # (wall clock ms, build description, critical path) of the longest
+        # builds, shortest first
+        self.longest_builds = []
+        # Task name -> [times on the critical path, ms on the critical path]
+        self.critical_tasks = collections.defaultdict(lambda: [0, 0])
+        # Node label -> queue waits in ms
+        self.queue_waits = collections.defaultdict(list)
+        # Node label -> bucket index -> busy executor ms
+        self.busy_ms = collections.defaultdict(
+            lambda: collections.defaultdict(int)
+        )
+        # Task name -> [runs, total ms, longest ms]
+        self.job_times = collections.defaultdict(lambda: [0, 0, 0])
+
+    @staticmethod
+    def critical_path(tasks):
+        """Returns the chain of tasks that ended last: starting from the
+        task that ended last, repeatedly take the task that ended last
+        before the current one started."""
+        tasks = sorted(tasks, key=lambda task: task.end)
+        ends = [task.end for task in tasks]
+        path = []
+        current = tasks[-1] if tasks else None
+        while current is not None:
+            path.append(current)
+            index = bisect.bisect_right(ends, current.start)
+            current = tasks[index - 1] if index > 0 else None
+        path.reverse()
+        return path
+
+    def add_busy_interval(self, label, start, end):
+        bucket = start // self.bucket_ms
+        while start < end:
+            bucket_end = (bucket + 1) * self.bucket_ms
+            self.busy_ms[label][bucket] += min(end, bucket_end) - start
+            start = bucket_end
+            bucket += 1
+
+    def add_build(self, key, subtasks):
+        self.build_count += 1
+        tasks = []
+        build_start = build_end = None
+        for subtask in subtasks:
+            if subtask.start == UNSET or subtask.end == UNSET:
+                continue
+            if build_start is None or subtask.start < build_start:
+                build_start = subtask.start
+            if build_end is None or subtask.end > build_end:
+                build_end = subtask.end
+            if subtask.group == MAIN_GROUP:
+                continue
+            tasks.append(subtask)
+            name = task_name(subtask)
+            duration = subtask.end - subtask.start
+            times = self.job_times[name]
+            times[0] += 1
+            times[1] += duration
+            times[2] = max(times[2], duration)
+            self.add_busy_interval(subtask.group, subtask.start, subtask.end)
+            if subtask.inner_start != UNSET:
+                self.queue_waits[subtask.group].append(
+                    subtask.inner_start - subtask.start
+                )
+        if build_start is None:
+            return
+        path = self.critical_path(tasks)
+        for task in path:
+            entry = self.critical_tasks[task_name(task)]
+            entry[0] += 1
+            entry[1] += task.end - task.start
+        longest = (build_end - build_start,
+                   timestamps_bundle.describe_build(key),
+                   [(task_name(task), task.end - task.start)
+                    for task in path])
+        bisect.insort(self.longest_builds, longest)
+        if len(self.longest_builds) > self.longest_builds_count:
+            del self.longest_builds[0]
+
+    def print_report(self, output, top, executors):
+        write = output.write
+        write("{} builds analysed\n".format(self.build_count))
+
+        write("\nLongest builds and their critical path\n")
+        for wall_clock, build, path in reversed(self.longest_builds):
+            write("{:>10} {}\n".format(format_duration(wall_clock), build))
+            for name, duration in path:
+                write("{:>10}   {}\n".format(format_duration(duration), name))
+
+        write("\nJobs most often on the critical path\n")
+        write("{:>8} {:>12}  {}\n".format("Builds", "Time", "Job"))
+        for name, (count, duration) in sorted(
+                self.critical_tasks.items(),
+                key=lambda item: (-item[1][1], item[0]))[:top]:
+            write("{:>8} {:>12}  {}\n".format(
+                count, format_duration(duration), name
+            ))
+
+        write("\nQueue wait (innerStart - start) per node label\n")
+        write("{:>8} {:>10} {:>10} {:>10} {:>10}  {}\n".format(
+            "Jobs", "Mean", "p50", "p90", "Max", "Label"
+        ))
+        for label, waits in sorted(self.queue_waits.items()):
+            waits.sort()
+            write("{:>8} {:>10} {:>10} {:>10} {:>10}  {}\n".format(
+                len(waits),
+                format_duration(sum(waits) / len(waits)),
+                format_duration(timestamps_bundle.percentile(waits, 0.5)),
+                format_duration(timestamps_bundle.percentile(waits, 0.9)),
+                format_duration(waits[-1]),
+                label
+            ))
+
+        write("\nExecutor utilisation per node label, over {}s periods\n"
+              .format(self.bucket_ms // 1000))
+        write("{:>12} {:>10} {:>10} {:>12}  {}\n".format(
+            "Busy", "Mean busy", "Peak busy", "Utilisation", "Label"
+        ))
+        for label, buckets in sorted(self.busy_ms.items()):
+            busy = sum(buckets.values())
+            span = (max(buckets) - min(buckets) + 1) * self.bucket_ms
+            mean = busy / span
+            peak = max(buckets.values()) / self.bucket_ms
+            utilisation = ""
+            if label in executors:
+                utilisation = "{:.1f}%".format(
+                    100 * mean / executors[label]
+                )
+            write("{:>12} {:>10.2f} {:>10.2f} {:>12}  {}\n".format(
+                format_duration(busy), mean, peak, utilisation, label
+            ))
+
+        write("\nJobs taking the most wall clock time\n")
+        write("{:>8} {:>12} {:>10} {:>10}  {}\n".format(
+            "Runs", "Total", "Mean", "Longest", "Job"
+        ))
+        for name, (runs, total, longest) in sorted(
+                self.job_times.items(),
+                key=lambda item: (-item[1][1], item[0]))[:top]:
+            write("{:>8} {:>12} {:>10} {:>10}  {}\n".format(
+                runs, format_duration(total), format_duration(total / runs),
+                format_duration(longest), name
+            ))
+
+    def write_utilisation_csv(self, path):
+        """Writes the busy executor time of each label in each period,
+        with the average number of busy executors."""
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["periodStart", "label", "busyMs", "meanBusy"])
+            for label, buckets in sorted(self.busy_ms.items()):
+                for bucket, busy in sorted(buckets.items()):
+                    writer.writerow([bucket * self.bucket_ms, label, busy,
+                                     "{:.3f}".format(busy / self.bucket_ms)])
+
+
+def parse_executors(value):
+    label, _, count = value.rpartition("=")
+    if not label:
+        raise argparse.ArgumentTypeError(
+            "Expected LABEL=COUNT, got '{}'".format(value)
+        )
+    try:
+        count = int(count)
+    except ValueError:
+        count = 0
+    if count < 1:
+        raise argparse.ArgumentTypeError(
+            "Expected a number of executors of at least 1, got '{}'"
+            .format(value)
+        )
+    return label, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "bundles", nargs="+",
+        help="timestamps-bundle.csv or .json files, possibly compressed"
+    )
+    parser.add_argument(
+        "-o", "--output-file",
+        help="file to write the report to (default: standard output)"
+    )
+    parser.add_argument(
+        "-n", "--top", type=int, default=20,
+        help="number of jobs listed in each ranking (default: 20)"
+    )
+    parser.add_argument(
+        "--longest-builds", type=int, default=5,
+        help="number of builds whose critical path is listed (default: 5)"
+    )
+    parser.add_argument(
+        "--period", type=int, default=3600,
+        help="length in seconds of the utilisation periods (default: 3600)"
+    )
+    parser.add_argument(
+        "--executors", nargs="+", default=[], metavar="LABEL=COUNT",
+        type=parse_executors,
+        help="number of executors of node labels, to report utilisation "
+             "as a percentage"
+    )
+    parser.add_argument(
+        "--utilisation-csv",
+        help="file to write the utilisation of each label in each period to"
+    )
+    args = parser.parse_args()
+    analyzer = TimestampsAnalyzer(args.period, args.longest_builds)
+    for bundle in args.bundles:
+        for key, subtasks in timestamps_bundle.iter_builds(
+                timestamps_bundle.read_bundle(bundle)):
+            analyzer.add_build(key, subtasks)
+    executors = dict(args.executors)
+    if args.output_file:
+        with open(args.output_file, "w") as output:
+            analyzer.print_report(output, args.top, executors)
+    else:
+        analyzer.print_report(sys.stdout, args.top, executors)
+    if args.utilisation_csv:
+        analyzer.write_utilisation_csv(args.utilisation_csv)
+
+
+if __name__ == "__main__":
+    main()
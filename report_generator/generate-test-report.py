@@ -17,12 +17,132 @@
 #
 #  This file is part of Mbed TLS (https://www.trustedfirmware.org/projects/mbed-tls/)
 
+import array
+import base64
+import binascii
+import bz2
 import csv
+import fnmatch
 import argparse
+import gzip
+import hashlib
+import heapq
+import json
+import mmap
+import re
+import shutil
+import sqlite3
 import sys
+import tempfile
 import subprocess
 import os
 import time
+import zlib
+from multiprocessing.pool import ThreadPool
+from xml.sax.saxutils import escape, quoteattr
+
+class OutcomeKeyTable(object):
+    """Open addressing hash table from test case keys to test results.
+
+    Keys are hashed to 60 bits and each entry is packed together with the
+    result and a 'seen' flag in a single machine word, so holding the keys of
+    a multi-gigabyte outcome file costs a dozen bytes per test case rather
+    than the hundreds of bytes taken by a dict of strings."""
+
+    HASH_MASK = (1 << 60) - 1
+    SEEN_FLAG = 4
+    RESULT_MASK = 3
+    ENTRY_SHIFT = 3
+
+    def __init__(self, capacity=1 << 16):
+        self.slots = array.array("l", [0]) * capacity
+        self.mask = capacity - 1
+        self.size = 0
+
+    @staticmethod
+    def hash_key(*fields):
+        return hash(fields) & OutcomeKeyTable.HASH_MASK
+
+    def find(self, key_hash):
+        """Return the index of the slot holding key_hash, or of the empty
+        slot where it belongs."""
+        slots = self.slots
+        mask = self.mask
+        index = key_hash & mask
+        entry = slots[index]
+        while entry != 0 and entry >> OutcomeKeyTable.ENTRY_SHIFT != key_hash:
+            index = (index + 1) & mask
+            entry = slots[index]
+        return index
+
+    def grow(self):
+        old_slots = self.slots
+        self.slots = array.array("l", [0]) * (2 * len(old_slots))
+        self.mask = len(self.slots) - 1
+        for entry in old_slots:
+            if entry != 0:
+                self.slots[self.find(
+                    entry >> OutcomeKeyTable.ENTRY_SHIFT)] = entry
+
+    def add(self, key_hash, result):
+        """Record result (a non-zero value below 4) for key_hash. When the
+        key is already present, a non-zero result overrides the previous
+        one only if it is larger."""
+        if 10 * (self.size + 1) > 7 * len(self.slots):
+            self.grow()
+        index = self.find(key_hash)
+        entry = self.slots[index]
+        if entry == 0:
+            self.size += 1
+            self.slots[index] = \
+                (key_hash << OutcomeKeyTable.ENTRY_SHIFT) | result
+        elif result > entry & OutcomeKeyTable.RESULT_MASK:
+            self.slots[index] = \
+                (entry & ~OutcomeKeyTable.RESULT_MASK) | result
+
+    def get_and_mark(self, key_hash):
+        """Return the result recorded for key_hash, or 0 if there is none,
+        and flag the key as seen."""
+        index = self.find(key_hash)
+        entry = self.slots[index]
+        if entry != 0:
+            self.slots[index] = entry | OutcomeKeyTable.SEEN_FLAG
+        return entry & OutcomeKeyTable.RESULT_MASK
+
+    def count_unseen(self):
+        return sum(1 for entry in self.slots
+                   if entry != 0 and not entry & OutcomeKeyTable.SEEN_FLAG)
+
+class ReportTable(object):
+    """The rows of a report table. The width of each column is maintained
+    as rows are added, so that the table can be written out in a single pass.
+    When max_rows is set, only the first max_rows rows are kept and the
+    others are just counted."""
+
+    def __init__(self, keys, max_rows=None):
+        self.keys = keys
+        self.max_rows = max_rows
+        self.rows = []
+        self.num_rows = 0
+        self.widths = [len(str(key)) for key in keys]
+
+    def add_row(self, *values):
+        self.num_rows += 1
+        if self.max_rows is not None and len(self.rows) >= self.max_rows:
+            return
+        self.rows.append(values)
+        widths = self.widths
+        for i, val in enumerate(values):
+            width = len(str(val))
+            if width > widths[i]:
+                widths[i] = width
+
+    def column(self, key):
+        index = self.keys.index(key)
+        return [row[index] for row in self.rows]
+
+    def __len__(self):
+        return self.num_rows
 
 class ReportGenerator:
     # This script expects the CSV file to contain the following fields
@@ -39,6 +159,98 @@ class ReportGenerator:
     TEST_RESULT_FAIL = "FAIL"
     TEST_RESULT_SKIP = "SKIP"
 
+    # Outcome files produced by the test scripts contain one test case per
+    # line with the following semicolon separated fields and no header
+    OUTCOME_DELIMITER = ";"
+    OUTCOME_PLATFORM  = "Platform"
+    OUTCOME_COMPONENT = "Component"
+    OUTCOME_SUITE     = "Test suite"
+    OUTCOME_CASE      = "Test case"
+    OUTCOME_RESULT    = "Result"
+    OUTCOME_CAUSE     = "Cause"
+    OUTCOME_FIELDS = [OUTCOME_PLATFORM, OUTCOME_COMPONENT, OUTCOME_SUITE,
+        OUTCOME_CASE, OUTCOME_RESULT, OUTCOME_CAUSE]
+
+    # Compact codes for test results, as stored in OutcomeKeyTable. A
+    # failure takes precedence when a test case is recorded twice.
+    RESULT_CODES = {TEST_RESULT_PASS: 1, TEST_RESULT_SKIP: 2,
+        TEST_RESULT_FAIL: 3}
+    RESULT_NAMES = [None, TEST_RESULT_PASS, TEST_RESULT_SKIP,
+        TEST_RESULT_FAIL]
+
+    # Failed tests are grouped by the reason and log file name left once
+    # directories, hexadecimal values and numbers are removed, and each
+    # group is shown with its first CLUSTER_EXAMPLES tests
+    SIGNATURE_PATH_PATTERN = re.compile(r"(?:[A-Za-z]:)?(?:[\w.~-]*[\\/])+")
+    SIGNATURE_HEX_PATTERN = re.compile(
+        r"\b(?:0[xX][0-9a-fA-F]+|[0-9a-fA-F]{8,})\b")
+    SIGNATURE_NUMBER_PATTERN = re.compile(r"\d+")
+    CLUSTER_EXAMPLES = 3
+
+    # Log excerpts are taken from the last LOG_EXCERPT_WINDOW bytes of each
+    # log file: the lines around the first error found there, or else the
+    # last lines. Logs are read by LOG_EXCERPT_THREADS threads.
+    LOG_EXCERPT_WINDOW = 1 << 20
+    LOG_EXCERPT_LINE_WIDTH = 200
+    LOG_EXCERPT_THREADS = 8
+    LOG_ERROR_PATTERN = re.compile(
+        r"\b(?:[Ee]rror|ERROR|FAILED|[Aa]ssertion|Segmentation fault)\b")
+
+    # Jobs of all.sh components are named [<prefix>]all_<platform>-<component>
+    # in the job duration ranking written by job_durations.py
+    ALL_SH_JOB_PATTERN = re.compile(r"all_[^-]+-(.+)$")
+    COMPONENT_DURATION_FIELD = "p90"
+
+    # Outcome database. Each text field is stored once in its own table and
+    # the outcomes only hold row ids, and the outcome_view view joins them
+    # back together.
+    SQLITE_DICTIONARIES = ["platform", "component", "suite", "test_case",
+        "result", "cause"]
+    SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS run (id INTEGER PRIMARY KEY, file TEXT UNIQUE);
+{dictionaries}
+CREATE TABLE IF NOT EXISTS outcome (
+    run_id INTEGER NOT NULL,
+    platform_id INTEGER NOT NULL,
+    component_id INTEGER NOT NULL,
+    suite_id INTEGER NOT NULL,
+    test_case_id INTEGER NOT NULL,
+    result_id INTEGER NOT NULL,
+    cause_id INTEGER NOT NULL
+);
+CREATE VIEW IF NOT EXISTS outcome_view AS
+    SELECT run.file AS file, platform.name AS platform,
+        component.name AS component, suite.name AS suite,
+        test_case.name AS test_case, result.name AS result,
+        cause.name AS cause
+    FROM outcome
+    JOIN run ON run.id = outcome.run_id
+    JOIN platform ON platform.id = outcome.platform_id
+    JOIN component ON component.id = outcome.component_id
+    JOIN suite ON suite.id = outcome.suite_id
+    JOIN test_case ON test_case.id = outcome.test_case_id
+    JOIN result ON result.id = outcome.result_id
+    JOIN cause ON cause.id = outcome.cause_id;
+""".format(dictionaries="\n".join(
+        "CREATE TABLE IF NOT EXISTS {0} "
+        "(id INTEGER PRIMARY KEY, name TEXT UNIQUE);".format(table)
+        for table in SQLITE_DICTIONARIES))
+    # Indexes are created once the outcomes are loaded, which is quicker
+    # than maintaining them during the load
+    SQLITE_INDEXES = """
+CREATE INDEX IF NOT EXISTS outcome_by_result ON outcome (result_id);
+CREATE INDEX IF NOT EXISTS outcome_by_suite
+    ON outcome (suite_id, test_case_id);
+CREATE INDEX IF NOT EXISTS outcome_by_component ON outcome (component_id);
+"""
+    SQLITE_BATCH_ROWS = 10000
+
+    # JUnit XML report. Characters that XML 1.0 does not allow, even
+    # escaped, are replaced, and at most JUNIT_CAUSE_CACHE_SIZE escaped
+    # causes are kept for reuse.
+    XML_INVALID_PATTERN = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+    JUNIT_CAUSE_CACHE_SIZE = 10000
+
     # Tools used when creating the pdf report
     TOOL_PANDOC = "pandoc"
     TOOL_LOWRITER = "lowriter"
@@ -49,19 +261,35 @@ class ReportGenerator:
     # Template for the markdown report
     MARKDOWN_TEMPLATE = "markdown-mbed-tls-template.md"
 
+    # Template for the html report
+    HTML_TEMPLATE = "html-mbed-tls-template.html"
+    HTML_TITLE = "mbed TLS Test Report"
+
     DOCX_EXT = ".docx"
     MD_EXT = ".md"
+    PDF_EXT = ".pdf"
 
     # Metadata information for the report
     REPORT_CONFIDENTIALITY = "Confidential Restricted"
     ARM_DIVISION = "IOTBU"
 
-    def __init__(self, csv_file, csv_delimiter):
+    def __init__(self, csv_file, csv_delimiter, max_table_rows=None,
+                 table_page_rows=None, log_excerpt_lines=0, log_dir=None):
         self.csv_file = csv_file
         self.csv_delimiter = csv_delimiter
         self.csv_data = None
-
-        self.read_csv()
+        # Rows beyond max_table_rows are left out of the large tables, and
+        # the table header is repeated every table_page_rows rows
+        self.max_table_rows = max_table_rows
+        self.table_page_rows = table_page_rows
+        # The detailed reports include up to log_excerpt_lines lines of the
+        # log of each failed test. Relative log file paths are relative to
+        # log_dir, or else to the directory of the CSV file.
+        self.log_excerpt_lines = log_excerpt_lines
+        self.log_dir = log_dir
+
+    def open_output(self, output_file):
+        return open(output_file, "w", 1 << 16)
 
     # Print output to a file
     def println(self, *args):
@@ -85,6 +313,45 @@ class ReportGenerator:
                     unquoted_val = self.unquote_str(quoted_val)
                     self.csv_data[col].append(unquoted_val)
 
+    def get_csv_data(self):
+        if self.csv_data is None:
+            self.read_csv()
+        return self.csv_data
+
+    @staticmethod
+    def open_outcome_file(file_path):
+        """Open an outcome file for reading, decompressing it on the fly when
+        its name ends in .gz, .bz2 or .xz"""
+        if file_path.endswith(".gz"):
+            return gzip.open(file_path, "rb")
+        if file_path.endswith(".bz2"):
+            return bz2.BZ2File(file_path, "rb")
+        if file_path.endswith(".xz"):
+            try:
+                import lzma
+                return lzma.open(file_path, "rb")
+            except ImportError:
+                # lzma is not part of the Python 2 standard library
+                xz_proc = subprocess.Popen(["xz", "-dc", file_path],
+                    stdout=subprocess.PIPE, bufsize=1 << 20)
+                return xz_proc.stdout
+        return open(file_path, "rb", 1 << 20)
+
+    @staticmethod
+    def read_outcomes(file_path):
+        """Stream the rows of an outcome file as lists of fields in the order
+        of OUTCOME_FIELDS. Malformed lines are skipped."""
+        num_fields = len(ReportGenerator.OUTCOME_FIELDS)
+        outcome_stream = ReportGenerator.open_outcome_file(file_path)
+        try:
+            for line in outcome_stream:
+                fields = line.rstrip("\r\n").split(
+                    ReportGenerator.OUTCOME_DELIMITER, num_fields - 1)
+                if len(fields) == num_fields:
+                    yield fields
+        finally:
+            outcome_stream.close()
+
     def shorten_path(self, file_path):
         path, file_name = os.path.split(file_path)
         if len(path) > 0:
@@ -93,62 +360,176 @@ class ReportGenerator:
             return file_name
 
     def extract_detailed(self):
-        make_tests_dict = lambda keys: \
-            dict(zip(keys, [[] for i in range(len(keys))]))
-
+        self.get_csv_data()
         num_tests = len(self.csv_data[ReportGenerator.TEST_NO])
 
-        failed_keys = [ReportGenerator.TEST_NO, ReportGenerator.TEST_SCRIPT,
-            ReportGenerator.TEST_NAME, ReportGenerator.TEST_LOG_FILE]
-        failed_tests = make_tests_dict(failed_keys)
-
-        passed_keys = [ReportGenerator.TEST_NO, ReportGenerator.TEST_SCRIPT,
-            ReportGenerator.TEST_NAME]
-        passed_tests = make_tests_dict(passed_keys)
-
-        skipped_keys = [ReportGenerator.TEST_NO, ReportGenerator.TEST_SCRIPT,
-            ReportGenerator.TEST_NAME, ReportGenerator.TEST_DEPENDENCIES,
-            ReportGenerator.TEST_REASON]
-        skipped_tests = make_tests_dict(skipped_keys)
-
+        failed_tests = ReportTable([ReportGenerator.TEST_NO,
+            ReportGenerator.TEST_SCRIPT, ReportGenerator.TEST_NAME,
+            ReportGenerator.TEST_LOG_FILE], self.max_table_rows)
+        passed_tests = ReportTable([ReportGenerator.TEST_NO,
+            ReportGenerator.TEST_SCRIPT, ReportGenerator.TEST_NAME],
+            self.max_table_rows)
+        skipped_tests = ReportTable([ReportGenerator.TEST_NO,
+            ReportGenerator.TEST_SCRIPT, ReportGenerator.TEST_NAME,
+            ReportGenerator.TEST_DEPENDENCIES, ReportGenerator.TEST_REASON],
+            self.max_table_rows)
+
+        numbers = self.csv_data[ReportGenerator.TEST_NO]
+        scripts = self.csv_data[ReportGenerator.TEST_SCRIPT]
+        names = self.csv_data[ReportGenerator.TEST_NAME]
+        results = self.csv_data[ReportGenerator.TEST_RESULT]
         for i in range(num_tests):
-            if self.csv_data[ReportGenerator.TEST_RESULT][i] == \
-                ReportGenerator.TEST_RESULT_PASS:
-                passed_tests[ReportGenerator.TEST_NAME].append(
-                    self.csv_data[ReportGenerator.TEST_NAME][i])
-                passed_tests[ReportGenerator.TEST_NO].append(
-                    self.csv_data[ReportGenerator.TEST_NO][i])
-                passed_tests[ReportGenerator.TEST_SCRIPT].append(
-                    self.shorten_path(
-                    self.csv_data[ReportGenerator.TEST_SCRIPT][i]))
-            elif self.csv_data[ReportGenerator.TEST_RESULT][i] == \
-                ReportGenerator.TEST_RESULT_SKIP:
-                skipped_tests[ReportGenerator.TEST_NAME].append(
-                    self.csv_data[ReportGenerator.TEST_NAME][i])
-                skipped_tests[ReportGenerator.TEST_NO].append(
-                    self.csv_data[ReportGenerator.TEST_NO][i])
-                skipped_tests[ReportGenerator.TEST_DEPENDENCIES].append(
-                    self.csv_data[ReportGenerator.TEST_DEPENDENCIES][i])
-                skipped_tests[ReportGenerator.TEST_REASON].append(
+            if results[i] == ReportGenerator.TEST_RESULT_PASS:
+                passed_tests.add_row(numbers[i],
+                    self.shorten_path(scripts[i]), names[i])
+            elif results[i] == ReportGenerator.TEST_RESULT_SKIP:
+                skipped_tests.add_row(numbers[i],
+                    self.shorten_path(scripts[i]), names[i],
+                    self.csv_data[ReportGenerator.TEST_DEPENDENCIES][i],
                     self.csv_data[ReportGenerator.TEST_REASON][i])
-                skipped_tests[ReportGenerator.TEST_SCRIPT].append(
-                    self.shorten_path(
-                    self.csv_data[ReportGenerator.TEST_SCRIPT][i]))
             else:
-                failed_tests[ReportGenerator.TEST_NO].append(
-                    self.csv_data[ReportGenerator.TEST_NO][i])
-                failed_tests[ReportGenerator.TEST_NAME].append(
-                    self.csv_data[ReportGenerator.TEST_NAME][i])
-                failed_tests[ReportGenerator.TEST_LOG_FILE].append(
+                failed_tests.add_row(numbers[i],
+                    self.shorten_path(scripts[i]), names[i],
                     self.csv_data[ReportGenerator.TEST_LOG_FILE][i])
-                failed_tests[ReportGenerator.TEST_SCRIPT].append(
-                    self.shorten_path(
-                    self.csv_data[ReportGenerator.TEST_SCRIPT][i]))
 
-        return (failed_keys, failed_tests, passed_keys, passed_tests,
-            skipped_keys, skipped_tests)
+        return (failed_tests, passed_tests, skipped_tests)
+
+    @staticmethod
+    def get_failure_signature(text):
+        """Reduce a failure reason or log file name to what failures with the
+        same cause have in common, by removing directories, addresses and
+        numbers."""
+        text = ReportGenerator.SIGNATURE_PATH_PATTERN.sub("", text)
+        text = ReportGenerator.SIGNATURE_HEX_PATTERN.sub("#", text)
+        text = ReportGenerator.SIGNATURE_NUMBER_PATTERN.sub("#", text)
+        return " ".join(text.split())
+
+    def extract_failure_clusters(self):
+        """Group the failed tests by the signature of their reason and of
+        their log file. Each distinct reason and log file name is only
+        reduced to its signature once, and the clusters are looked up in a
+        dict, so this takes linear time however many tests failed."""
+        self.get_csv_data()
+        num_tests = len(self.csv_data[ReportGenerator.TEST_NO])
+        scripts = self.csv_data[ReportGenerator.TEST_SCRIPT]
+        names = self.csv_data[ReportGenerator.TEST_NAME]
+        results = self.csv_data[ReportGenerator.TEST_RESULT]
+        # Older CSV files have no reason for failed tests
+        reasons = self.csv_data.get(ReportGenerator.TEST_REASON,
+            [""] * num_tests)
+        log_files = self.csv_data[ReportGenerator.TEST_LOG_FILE]
+
+        signatures = {}
+        def get_signature(text):
+            signature = signatures.get(text)
+            if signature is None:
+                signature = signatures[text] = \
+                    self.get_failure_signature(text)
+            return signature
+
+        # (reason signature, log file signature) -> [count, examples]
+        clusters = {}
+        for i in range(num_tests):
+            if results[i] in (ReportGenerator.TEST_RESULT_PASS,
+                              ReportGenerator.TEST_RESULT_SKIP):
+                continue
+            key = (get_signature(reasons[i]),
+                get_signature(os.path.basename(log_files[i])))
+            cluster = clusters.get(key)
+            if cluster is None:
+                cluster = clusters[key] = [0, []]
+            cluster[0] += 1
+            if len(cluster[1]) < ReportGenerator.CLUSTER_EXAMPLES:
+                cluster[1].append("{0}: {1}".format(
+                    self.shorten_path(scripts[i]), names[i]))
+
+        failure_clusters = ReportTable(["Failures", ReportGenerator.TEST_REASON,
+            ReportGenerator.TEST_LOG_FILE, "Examples"], self.max_table_rows)
+        for key, (count, examples) in sorted(clusters.iteritems(),
+            key=lambda item: (-item[1][0], item[0])):
+            failure_clusters.add_row(count, key[0] or "-", key[1] or "-",
+                "; ".join(examples))
+        return failure_clusters
+
+    def get_log_path(self, log_file):
+        if os.path.isabs(log_file):
+            if self.log_dir is not None and not os.path.exists(log_file):
+                # The logs were moved since the tests ran
+                return os.path.join(self.log_dir, os.path.basename(log_file))
+            return log_file
+        return os.path.join(self.log_dir or os.path.dirname(self.csv_file),
+            log_file)
+
+    def read_log_excerpt(self, log_file):
+        """Return the excerpt of a log file to show in the report, as a list
+        of lines, or None if the log file cannot be read. The file is mapped
+        in memory and only its last LOG_EXCERPT_WINDOW bytes are searched,
+        so the cost of an excerpt does not depend on the size of the log."""
+        num_lines = self.log_excerpt_lines
+        try:
+            log_stream = open(self.get_log_path(log_file), "rb")
+        except IOError:
+            return None
+        with log_stream:
+            size = os.fstat(log_stream.fileno()).st_size
+            if size == 0:
+                return []
+            data = mmap.mmap(log_stream.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                window_start = max(0, size - ReportGenerator.LOG_EXCERPT_WINDOW)
+                def skip_lines_back(position, count):
+                    # Return the start of the line count lines before the
+                    # one ending at position
+                    for _ in range(count):
+                        position = data.rfind("\n", window_start, position)
+                        if position < 0:
+                            return window_start
+                    return position + 1
+
+                error = ReportGenerator.LOG_ERROR_PATTERN.search(data,
+                    window_start)
+                if error is not None:
+                    start = skip_lines_back(error.start(), num_lines // 2 + 1)
+                    end = error.start()
+                    for _ in range(num_lines - num_lines // 2):
+                        end = data.find("\n", end + 1)
+                        if end < 0:
+                            end = size
+                            break
+                else:
+                    end = size
+                    if data[size - 1] == "\n":
+                        end -= 1
+                    start = skip_lines_back(end, num_lines)
+                lines = data[start:end].splitlines()
+            finally:
+                data.close()
+        return [line[:ReportGenerator.LOG_EXCERPT_LINE_WIDTH]
+                for line in lines[:num_lines]]
+
+    def extract_log_excerpts(self, failed_tests):
+        """Read the log excerpts of the failed tests listed in the report
+        concurrently. Returns (test, log file, excerpt) triples in the order
+        of the table, each log file being read once."""
+        if not self.log_excerpt_lines or not failed_tests.rows:
+            return []
+        log_files = failed_tests.column(ReportGenerator.TEST_LOG_FILE)
+        unique_log_files = list(set(log_file for log_file in log_files
+            if log_file))
+        pool = ThreadPool(max(1, min(ReportGenerator.LOG_EXCERPT_THREADS,
+            len(unique_log_files))))
+        try:
+            excerpts = dict(zip(unique_log_files,
+                pool.map(self.read_log_excerpt, unique_log_files)))
+        finally:
+            pool.close()
+            pool.join()
+        return [("{0} {1}".format(row[0], row[2]), log_file,
+                 excerpts.get(log_file))
+                for row, log_file in zip(failed_tests.rows, log_files)]
 
     def extract_summary(self):
+        self.get_csv_data()
         num_tests = len(self.csv_data[ReportGenerator.TEST_NO])
         count = lambda col, status: sum([1 for i in range(num_tests) \
             if self.csv_data[col][i] == status])
@@ -178,112 +559,894 @@ class ReportGenerator:
 
 
     def print_ascii_detailed(self):
-        failed_keys, failed_tests, passed_keys, passed_tests, skipped_keys, \
-            skipped_tests = self.extract_detailed()
+        failed_tests, passed_tests, skipped_tests = self.extract_detailed()
 
         self.println("Test Report Detailed Overview for '{0}'".format(self.csv_file))
+        self.println("Failures grouped by cause:")
+        self.print_ascii_table(self.extract_failure_clusters())
+
+        self.println("")
         self.println("Failed tests:")
-        self.print_ascii_table(failed_keys, failed_tests)
+        self.print_ascii_table(failed_tests)
+
+        log_excerpts = self.extract_log_excerpts(failed_tests)
+        if log_excerpts:
+            self.println("")
+            self.println("Logs of the failed tests:")
+            for test, log_file, excerpt in log_excerpts:
+                self.println("")
+                self.println("{0} ({1}):".format(test, log_file or "no log"))
+                if excerpt is None:
+                    self.println("    (log file not found)")
+                for line in excerpt or []:
+                    self.println("    " + line)
 
         self.println("")
         self.println("Skipped tests:")
-        self.print_ascii_table(skipped_keys, skipped_tests)
+        self.print_ascii_table(skipped_tests)
 
         self.println("")
         self.println("Passed tests:")
-        self.print_ascii_table(passed_keys, passed_tests)
+        self.print_ascii_table(passed_tests)
 
         self.println("")
 
-    def print_ascii_table(self, keys, data):
-        format_val = lambda width, val: str(" {:" + str(width) +
-            "} ").format(val)
-        format_header = lambda key: format_val(col_widths[key], key)
-        format_body = lambda key: format_val(col_widths[key], data[key][i])
-        make_table_divider = lambda: "+{0}+".format(
-            "+".join(map(lambda l: (l + 2) * '-', [col_widths[key] \
-            for key in keys])))
-
-        # Find out the width of each column in the table
-        col_widths = {}
-        for key in keys:
-            col_widths[key] = max(len(str(val)) for val in [key] + data[key])
+    def print_omitted_rows(self, table):
+        if len(table) > len(table.rows):
+            self.println("({0} more rows not shown)".format(
+                len(table) - len(table.rows)))
+
+    def print_ascii_table(self, table):
+        write = self.output_stream.write
+        divider = "+{0}+".format("+".join((width + 2) * "-"
+            for width in table.widths)) + os.linesep
+        row_format = "|{0}|".format("|".join(" {" + str(i) + ":" +
+            str(width) + "} " for i, width in enumerate(table.widths))) + \
+            os.linesep
+        header = divider + row_format.format(*table.keys) + divider
+        page_rows = self.table_page_rows
 
         # Print the table header
-        self.println(make_table_divider())
-        self.println("|{0}|".format("|".join(map(format_header, keys))))
-        self.println(make_table_divider())
+        write(header)
 
-        num_tests = len(data[keys[0]])
-        for i in range(num_tests):
-            self.println("|{0}|".format("|".join(map(format_body, keys))))
+        for i, row in enumerate(table.rows):
+            if page_rows and i > 0 and i % page_rows == 0:
+                write(header)
+            write(row_format.format(*row))
 
         # Add the end of table
-        self.println(make_table_divider())
+        write(divider)
+        self.print_omitted_rows(table)
+
+    def extract_diff(self, baseline_file):
+        """Compare the outcome file of this report against the outcome file
+        of an earlier run. The test case keys of the baseline are loaded in a
+        compact hash table, then the current outcome file is streamed and
+        joined against it, so neither file is ever held in memory."""
+        baseline = OutcomeKeyTable()
+        for fields in self.read_outcomes(baseline_file):
+            result = ReportGenerator.RESULT_CODES.get(fields[4])
+            if result is not None:
+                baseline.add(OutcomeKeyTable.hash_key(*fields[:4]), result)
+
+        diff_keys = [ReportGenerator.OUTCOME_PLATFORM,
+            ReportGenerator.OUTCOME_COMPONENT, ReportGenerator.OUTCOME_SUITE,
+            ReportGenerator.OUTCOME_CASE, "Previous result",
+            ReportGenerator.OUTCOME_CAUSE]
+        new_failures = ReportTable(diff_keys, self.max_table_rows)
+        new_passes = ReportTable(diff_keys, self.max_table_rows)
+        new_executions = ReportTable(diff_keys, self.max_table_rows)
+        new_skips = ReportTable(diff_keys, self.max_table_rows)
+
+        pass_code = ReportGenerator.RESULT_CODES[
+            ReportGenerator.TEST_RESULT_PASS]
+        fail_code = ReportGenerator.RESULT_CODES[
+            ReportGenerator.TEST_RESULT_FAIL]
+        new_cases = 0
+        for fields in self.read_outcomes(self.csv_file):
+            result = ReportGenerator.RESULT_CODES.get(fields[4])
+            if result is None:
+                continue
+            previous = baseline.get_and_mark(
+                OutcomeKeyTable.hash_key(*fields[:4]))
+            if previous == 0:
+                new_cases += 1
+            if previous == result:
+                continue
+            if result == fail_code:
+                tests = new_failures
+            elif result == pass_code and previous == fail_code:
+                tests = new_passes
+            elif result == pass_code:
+                # Skipped in the baseline or not in it at all
+                tests = new_executions
+            else:
+                tests = new_skips
+            tests.add_row(fields[0], fields[1], fields[2], fields[3],
+                ReportGenerator.RESULT_NAMES[previous] or "-", fields[5])
+
+        return (new_failures, new_passes, new_executions, new_skips,
+            new_cases, baseline.count_unseen())
+
+    def print_ascii_diff(self, baseline_file, output_file):
+        new_failures, new_passes, new_executions, new_skips, new_cases, \
+            missing_cases = self.extract_diff(baseline_file)
+
+        with self.open_output(output_file) as self.output_stream:
+            self.println("Test Outcome Differences for '{0}' against "
+                "'{1}'".format(self.csv_file, baseline_file))
+            self.println("Newly failing tests:", len(new_failures))
+            self.println("Newly passing tests:", len(new_passes))
+            self.println("Newly executed tests:", len(new_executions))
+            self.println("Newly skipped tests:", len(new_skips))
+            self.println("Tests not in the baseline:", new_cases)
+            self.println("Tests missing from this run:", missing_cases)
+            self.println("")
+
+            self.println("Newly failing tests:")
+            self.print_ascii_table(new_failures)
+            self.println("")
+            self.println("Newly passing tests:")
+            self.print_ascii_table(new_passes)
+            self.println("")
+            self.println("Newly executed tests (passing, previously skipped "
+                "or not run):")
+            self.print_ascii_table(new_executions)
+            self.println("")
+            self.println("Newly skipped tests:")
+            self.print_ascii_table(new_skips)
+            self.println("")
+
+    def extract_coverage(self):
+        """Build the test case x component matrix of the outcome file of this
+        report. Each test case holds one bitset of the components that
+        executed it and one of the components that skipped it, so memory
+        grows with the number of distinct test cases rather than with the
+        number of rows. The test cases executed and skipped by each
+        component are counted as their bits are first set. Skip reasons are
+        only kept for test cases that no component has executed so far."""
+        pass_code = ReportGenerator.RESULT_CODES[
+            ReportGenerator.TEST_RESULT_PASS]
+        fail_code = ReportGenerator.RESULT_CODES[
+            ReportGenerator.TEST_RESULT_FAIL]
+        skip_code = ReportGenerator.RESULT_CODES[
+            ReportGenerator.TEST_RESULT_SKIP]
+
+        # Component -> (bit, [executed test cases, skipped test cases])
+        component_bits = {}
+        component_names = []
+        interned = {}
+        matrix = {}
+        for fields in self.read_outcomes(self.csv_file):
+            result = ReportGenerator.RESULT_CODES.get(fields[4])
+            if result is None:
+                continue
+            component = component_bits.get(fields[1])
+            if component is None:
+                component = component_bits[fields[1]] = \
+                    (1 << len(component_names), [0, 0])
+                component_names.append(fields[1])
+            bit, counts = component
+            suite = interned.setdefault(fields[2], fields[2])
+            case = (suite, fields[3])
+            # [executed components, skipping components, skip reasons]
+            cell = matrix.get(case)
+            if cell is None:
+                cell = matrix[case] = [0, 0, None]
+            if result == skip_code:
+                if not cell[1] & bit:
+                    cell[1] |= bit
+                    counts[1] += 1
+                if cell[0] == 0:
+                    if cell[2] is None:
+                        cell[2] = set()
+                    cell[2].add(interned.setdefault(fields[5], fields[5]))
+            elif result in (pass_code, fail_code):
+                if not cell[0] & bit:
+                    cell[0] |= bit
+                    counts[0] += 1
+                cell[2] = None
+
+        count_bits = lambda bits: bin(bits).count("1")
+        component_stats = ReportTable([ReportGenerator.OUTCOME_COMPONENT,
+            "Executed", "Skipped"])
+        for name in component_names:
+            component_stats.add_row(name, *component_bits[name][1])
+
+        never_run = ReportTable([ReportGenerator.OUTCOME_SUITE,
+            ReportGenerator.OUTCOME_CASE, "Skipped in", "Skip reasons"],
+            self.max_table_rows)
+        single_run = ReportTable([ReportGenerator.OUTCOME_SUITE,
+            ReportGenerator.OUTCOME_CASE, ReportGenerator.OUTCOME_COMPONENT],
+            self.max_table_rows)
+        for case in sorted(matrix):
+            executed, skipped, reasons = matrix[case]
+            if executed == 0:
+                never_run.add_row(case[0], case[1], count_bits(skipped),
+                    "; ".join(sorted(reason or "-" for reason in reasons)))
+            elif executed & (executed - 1) == 0:
+                single_run.add_row(case[0], case[1],
+                    component_names[executed.bit_length() - 1])
+
+        return (len(matrix), component_stats, never_run, single_run)
+
+    def print_ascii_coverage(self, output_file):
+        num_cases, component_stats, never_run, single_run = \
+            self.extract_coverage()
+
+        with self.open_output(output_file) as self.output_stream:
+            self.println("Test Coverage Report for '{0}'".format(
+                self.csv_file))
+            self.println("Total test cases:", num_cases)
+            self.println("Total components:", len(component_stats))
+            self.println("Test cases never executed:", len(never_run))
+            self.println("Test cases executed in a single component:",
+                len(single_run))
+            self.println("")
+
+            self.println("Test cases per component:")
+            self.print_ascii_table(component_stats)
+            self.println("")
+            self.println("Test cases never executed (skipped in every "
+                "component):")
+            self.print_ascii_table(never_run)
+            self.println("")
+            self.println("Test cases executed in a single component:")
+            self.print_ascii_table(single_run)
+            self.println("")
+
+    @staticmethod
+    def read_component_durations(durations_file):
+        """Read the duration of each all.sh component from the job ranking
+        exported by job_durations.py. Jobs are named after the platform and
+        the component, as in all_u18-<component>, and a component that runs
+        on several platforms takes its shortest duration."""
+        durations = {}
+        with open(durations_file, "rb") as durations_stream:
+            for row in csv.DictReader(durations_stream):
+                match = ReportGenerator.ALL_SH_JOB_PATTERN.search(row["job"])
+                if match is None:
+                    continue
+                component = match.group(1)
+                duration = int(row[ReportGenerator.COMPONENT_DURATION_FIELD])
+                if component not in durations or \
+                    duration < durations[component]:
+                    durations[component] = duration
+        return durations
+
+    def extract_component_selection(self, durations_file=None):
+        """Select a small set of components that still executes every test
+        case executed in the outcome file of this report. The test cases
+        executed by each component are gathered in a bitset, then the
+        component that executes the most test cases not executed yet, per
+        second of duration when durations_file is given, is repeatedly
+        selected. Gains only ever shrink, so the candidates are kept in a
+        heap and a component's gain is only recomputed when it reaches the
+        top of the heap."""
+        pass_code = ReportGenerator.RESULT_CODES[
+            ReportGenerator.TEST_RESULT_PASS]
+        fail_code = ReportGenerator.RESULT_CODES[
+            ReportGenerator.TEST_RESULT_FAIL]
+
+        case_indexes = {}
+        interned = {}
+        # Component -> bytearray with one bit per executed test case
+        executed_bytes = {}
+        for fields in self.read_outcomes(self.csv_file):
+            if ReportGenerator.RESULT_CODES.get(fields[4]) not in \
+                (pass_code, fail_code):
+                continue
+            suite = interned.setdefault(fields[2], fields[2])
+            index = case_indexes.setdefault((suite, fields[3]),
+                len(case_indexes))
+            component_bytes = executed_bytes.get(fields[1])
+            if component_bytes is None:
+                component_bytes = executed_bytes[fields[1]] = bytearray()
+            byte = index >> 3
+            if byte >= len(component_bytes):
+                component_bytes.extend(
+                    bytearray(byte + 1 - len(component_bytes)))
+            component_bytes[byte] |= 1 << (index & 7)
+
+        # Test case i is bit i & 7 of byte i >> 3, so the bytes are read
+        # little-endian to make it bit i of the bitset
+        executed = {}
+        all_executed = 0
+        for component, component_bytes in executed_bytes.iteritems():
+            component_bytes.reverse()
+            executed[component] = long(
+                binascii.hexlify(bytes(component_bytes)) or "0", 16)
+            all_executed |= executed[component]
+        del executed_bytes
+
+        durations = None
+        if durations_file is not None:
+            durations = self.read_component_durations(durations_file)
+            # Components without a recorded duration are taken to be as
+            # long as the longest recorded one
+            unknown_duration = max(durations.values() or [1])
+            durations = dict((component,
+                max(1, durations.get(component, unknown_duration)))
+                for component in executed)
+
+        count_bits = lambda bits: bin(bits).count("1")
+        get_score = lambda component, gain: float(gain) / \
+            (durations[component] if durations else 1)
+        candidates = [(-get_score(component, count_bits(bits)), component)
+            for component, bits in executed.iteritems()]
+        heapq.heapify(candidates)
+
+        keys = [ReportGenerator.OUTCOME_COMPONENT, "New cases",
+            "Covered cases", "Coverage"]
+        if durations:
+            keys += ["Duration (s)", "Total duration (s)"]
+        selected = ReportTable(keys)
+        uncovered = all_executed
+        total_duration = 0
+        while candidates and uncovered:
+            score, component = heapq.heappop(candidates)
+            gain = count_bits(executed[component] & uncovered)
+            if gain == 0:
+                continue
+            current_score = -get_score(component, gain)
+            if candidates and current_score > candidates[0][0]:
+                heapq.heappush(candidates, (current_score, component))
+                continue
+            uncovered &= ~executed[component]
+            covered = len(case_indexes) - count_bits(uncovered)
+            row = [component, gain, covered,
+                "{0:.1f}%".format(100.0 * covered / len(case_indexes))]
+            if durations:
+                total_duration += durations[component]
+                row += [durations[component] // 1000,
+                    total_duration // 1000]
+            selected.add_row(*row)
+
+        selected_components = set(selected.column(
+            ReportGenerator.OUTCOME_COMPONENT))
+        keys = [ReportGenerator.OUTCOME_COMPONENT, "Executed"]
+        if durations:
+            keys.append("Duration (s)")
+        left_out = ReportTable(keys)
+        for component in sorted(executed):
+            if component not in selected_components:
+                row = [component, count_bits(executed[component])]
+                if durations:
+                    row.append(durations[component] // 1000)
+                left_out.add_row(*row)
+
+        all_duration = sum(durations.values()) if durations else None
+        return (len(case_indexes), selected, left_out, total_duration,
+            all_duration)
+
+    def print_ascii_component_selection(self, output_file,
+                                        durations_file=None):
+        num_cases, selected, left_out, selected_duration, all_duration = \
+            self.extract_component_selection(durations_file)
+
+        with self.open_output(output_file) as self.output_stream:
+            self.println("Component Selection Report for '{0}'".format(
+                self.csv_file))
+            self.println("Executed test cases:", num_cases)
+            self.println("Total components:", len(selected) + len(left_out))
+            self.println("Selected components:", len(selected))
+            if all_duration is not None:
+                self.println("Duration of all components (s):",
+                    all_duration // 1000)
+                self.println("Duration of the selected components (s):",
+                    selected_duration // 1000)
+            self.println("")
+
+            self.println("Selected components, in order of selection:")
+            self.print_ascii_table(selected)
+            self.println("")
+            self.println("Components whose test cases are all executed by "
+                "the selected components:")
+            self.print_ascii_table(left_out)
+            self.println("")
+
+    @staticmethod
+    def extract_flaky(outcome_files, max_table_rows=None):
+        """Find the test cases whose result flips between runs, given the
+        outcome files of successive runs, oldest first. A first pass over
+        the files collects the test cases that failed at least once, and
+        a second pass records in which runs each of them was executed and
+        failed, as two bitsets. Memory grows with the number of distinct
+        failing test cases, not with the number of rows."""
+        fail_code = ReportGenerator.RESULT_CODES[
+            ReportGenerator.TEST_RESULT_FAIL]
+        pass_code = ReportGenerator.RESULT_CODES[
+            ReportGenerator.TEST_RESULT_PASS]
+
+        failing = set()
+        # Most rows are discarded on their test case name alone, which is
+        # cheaper than hashing the whole key
+        failing_names = set()
+        num_rows = 0
+        for outcome_file in outcome_files:
+            for fields in ReportGenerator.read_outcomes(outcome_file):
+                num_rows += 1
+                if fields[4] == ReportGenerator.TEST_RESULT_FAIL:
+                    failing.add(OutcomeKeyTable.hash_key(*fields[1:4]))
+                    failing_names.add(fields[3])
+
+        # Key hash -> [(component, suite, case), executed runs, failed runs]
+        history = {}
+        for run, outcome_file in enumerate(outcome_files):
+            run_bit = 1 << run
+            for fields in ReportGenerator.read_outcomes(outcome_file):
+                if fields[3] not in failing_names:
+                    continue
+                result = ReportGenerator.RESULT_CODES.get(fields[4])
+                if result not in (pass_code, fail_code):
+                    continue
+                key_hash = OutcomeKeyTable.hash_key(*fields[1:4])
+                if key_hash not in failing:
+                    continue
+                entry = history.get(key_hash)
+                if entry is None:
+                    entry = history[key_hash] = [tuple(fields[1:4]), 0, 0]
+                entry[1] |= run_bit
+                # A test case that fails on any platform fails in this run
+                if result == fail_code:
+                    entry[2] |= run_bit
+
+        flaky = []
+        always_failing = 0
+        for key, executed, failed in history.itervalues():
+            results = [(failed >> run) & 1 for run in range(len(outcome_files))
+                if (executed >> run) & 1]
+            flips = sum(1 for previous, current in zip(results, results[1:])
+                if previous != current)
+            if flips == 0:
+                always_failing += 1
+                continue
+            flaky.append((float(flips) / (len(results) - 1), sum(results),
+                key, len(results), flips, "".join(
+                    "-" if not (executed >> run) & 1 else
+                    "F" if (failed >> run) & 1 else "."
+                    for run in range(len(outcome_files)))))
+        flaky.sort(key=lambda case: (-case[0], -case[1], case[2]))
+
+        flaky_tests = ReportTable([ReportGenerator.OUTCOME_COMPONENT,
+            ReportGenerator.OUTCOME_SUITE, ReportGenerator.OUTCOME_CASE,
+            "Runs", "Failures", "Flips", "Flip rate", "History"],
+            max_table_rows)
+        for flip_rate, failures, key, runs, flips, results in flaky:
+            flaky_tests.add_row(key[0], key[1], key[2], runs, failures,
+                flips, "{0:.2f}".format(flip_rate), results)
+
+        return (num_rows, len(history), always_failing, flaky_tests)
+
+    def print_ascii_flaky(self, outcome_files, output_file):
+        num_rows, num_failing, always_failing, flaky_tests = \
+            self.extract_flaky(outcome_files, self.max_table_rows)
+
+        with self.open_output(output_file) as self.output_stream:
+            self.println("Flaky Test Report for {0} runs".format(
+                len(outcome_files)))
+            for run, outcome_file in enumerate(outcome_files):
+                self.println("Run {0}: '{1}'".format(run + 1, outcome_file))
+            self.println("Total rows:", num_rows)
+            self.println("Test cases failing at least once:", num_failing)
+            self.println("Test cases failing in every run executing them:",
+                always_failing)
+            self.println("Flaky test cases:", len(flaky_tests))
+            self.println("")
+
+            self.println("Flaky test cases, by rate of result changes "
+                "between successive runs (history: '.' pass, 'F' fail, "
+                "'-' not executed):")
+            self.print_ascii_table(flaky_tests)
+            self.println("")
+
+    @staticmethod
+    def open_sqlite(database_file):
+        connection = sqlite3.connect(database_file)
+        # Outcome files are not necessarily valid UTF-8
+        connection.text_factory = str
+        connection.executescript(ReportGenerator.SQLITE_SCHEMA)
+        return connection
+
+    @staticmethod
+    def export_sqlite(outcome_files, database_file):
+        """Load outcome files into an SQLite database, replacing the
+        outcomes previously loaded from a file with the same path. Each
+        distinct text value is given an id from an in-memory dictionary, the
+        outcomes are inserted in batches in a single transaction, and the
+        indexes are created at the end. Returns the number of outcomes
+        loaded from each file."""
+        connection = ReportGenerator.open_sqlite(database_file)
+        loaded = []
+        try:
+            with connection:
+                connection.execute("DROP INDEX IF EXISTS outcome_by_result")
+                connection.execute("DROP INDEX IF EXISTS outcome_by_suite")
+                connection.execute(
+                    "DROP INDEX IF EXISTS outcome_by_component")
+                dictionaries = []
+                for table in ReportGenerator.SQLITE_DICTIONARIES:
+                    dictionaries.append(dict((name, row_id)
+                        for row_id, name in connection.execute(
+                            "SELECT id, name FROM {0}".format(table))))
+                for outcome_file in outcome_files:
+                    connection.execute("DELETE FROM outcome WHERE run_id IN "
+                        "(SELECT id FROM run WHERE file = ?)", (outcome_file,))
+                    connection.execute("DELETE FROM run WHERE file = ?",
+                        (outcome_file,))
+                    run_id = connection.execute(
+                        "INSERT INTO run (file) VALUES (?)",
+                        (outcome_file,)).lastrowid
+                    # New dictionary entries of each table
+                    new_entries = [[] for table in dictionaries]
+                    batch = []
+                    count = 0
+                    for fields in ReportGenerator.read_outcomes(outcome_file):
+                        row = [run_id]
+                        for index, value in enumerate(fields):
+                            ids = dictionaries[index]
+                            row_id = ids.get(value)
+                            if row_id is None:
+                                row_id = ids[value] = len(ids) + 1
+                                new_entries[index].append((row_id, value))
+                            row.append(row_id)
+                        batch.append(row)
+                        if len(batch) == ReportGenerator.SQLITE_BATCH_ROWS:
+                            ReportGenerator.insert_sqlite_batch(connection,
+                                new_entries, batch)
+                            count += len(batch)
+                            batch = []
+                    ReportGenerator.insert_sqlite_batch(connection,
+                        new_entries, batch)
+                    loaded.append((outcome_file, count + len(batch)))
+                connection.executescript(ReportGenerator.SQLITE_INDEXES)
+            connection.execute("ANALYZE")
+        finally:
+            connection.close()
+        return loaded
+
+    @staticmethod
+    def insert_sqlite_batch(connection, new_entries, batch):
+        for table, entries in zip(ReportGenerator.SQLITE_DICTIONARIES,
+                                  new_entries):
+            if entries:
+                connection.executemany(
+                    "INSERT INTO {0} (id, name) VALUES (?, ?)".format(table),
+                    entries)
+                del entries[:]
+        connection.executemany(
+            "INSERT INTO outcome VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+
+    def print_ascii_query(self, database_file, query, output_file=None):
+        """Run an SQL query on an outcome database and write its result as
+        an ascii table, to the standard output if output_file is None."""
+        connection = self.open_sqlite(database_file)
+        try:
+            start = time.time()
+            cursor = connection.execute(query)
+            keys = [column[0] for column in cursor.description or []]
+            result = ReportTable(keys, self.max_table_rows)
+            for row in cursor:
+                result.add_row(*["NULL" if value is None else value
+                                 for value in row])
+            elapsed = time.time() - start
+        finally:
+            connection.close()
+
+        def print_result():
+            if keys:
+                self.print_ascii_table(result)
+            self.println("{0} rows in {1:.3f}s".format(len(result), elapsed))
+        if output_file is None:
+            self.output_stream = sys.stdout
+            print_result()
+        else:
+            with self.open_output(output_file) as self.output_stream:
+                print_result()
 
     def print_ascii(self, output_file):
-        with open(output_file, "w") as self.output_stream:
+        with self.open_output(output_file) as self.output_stream:
             self.print_ascii_summary()
             self.print_ascii_detailed()
 
-    def print_pdf(self, output_pdf_file, author, email, report_number):
+    def get_pdf_cache_key(self, author, email, report_number):
+        """Hash everything the pdf report depends on, apart from the date of
+        issue: the input data, the report metadata and the templates, and
+        the size and modification time of the logs excerpts are read from."""
+        key = hashlib.sha256()
+        for file_path in [self.csv_file, ReportGenerator.MARKDOWN_TEMPLATE,
+                          ReportGenerator.PANDOC_DOCX_TEMPLATE]:
+            with open(file_path, "rb") as input_stream:
+                for chunk in iter(lambda: input_stream.read(1 << 20), ""):
+                    key.update(chunk)
+        key.update(repr((self.csv_delimiter, self.max_table_rows,
+            self.table_page_rows, self.log_excerpt_lines, self.log_dir,
+            author, email, report_number)))
+        if self.log_excerpt_lines:
+            failed_tests, _, _ = self.extract_detailed()
+            for log_file in sorted(set(failed_tests.column(
+                ReportGenerator.TEST_LOG_FILE))):
+                if not log_file:
+                    continue
+                try:
+                    log_stat = os.stat(self.get_log_path(log_file))
+                    key.update(repr((log_file, log_stat.st_size,
+                        log_stat.st_mtime)))
+                except OSError:
+                    key.update(repr((log_file, None)))
+        return key.hexdigest()
+
+    def print_pdf(self, output_pdf_file, author, email, report_number,
+                  cache_dir=None):
+        """Generate the .md report, convert it to .docx using pandoc, then
+        to pdf using LibreOffice Writer. When cache_dir is given, the
+        artifacts of each stage are stored there under a hash of the report
+        inputs and any stage already in the cache is skipped. Returns the
+        list of (stage, seconds) taken, where a cached stage takes None."""
         output_filename, _ = os.path.splitext(output_pdf_file)
         output_dir = os.path.dirname(output_pdf_file)
         output_md_file = output_filename + ReportGenerator.MD_EXT
         output_docx_file = output_filename + ReportGenerator.DOCX_EXT
-
-        markdown_title = ""
-        markdown_body = ""
-        with open(ReportGenerator.MARKDOWN_TEMPLATE, "r") as markdown_stream:
-            markdown_title = markdown_stream.readline().strip()
-            markdown_body = markdown_stream.read().strip()
-
-        # Generate .md file here
-        with open(output_md_file, "w") as self.output_stream:
-            self.println(markdown_title)
-            self.println("")
-            self.print_md_metadata(author, email, report_number)
-            self.println("")
-            self.println(markdown_body)
-            self.println("")
-            self.print_md_summary()
-            self.print_md_detailed()
-
-        # Generate docx document using pandoc
-        pandoc_cmd = [ReportGenerator.TOOL_PANDOC, "-S", "--reference-docx",
-            ReportGenerator.PANDOC_DOCX_TEMPLATE, "-f",
-            "markdown+multiline_tables", "--number-sections", "-o",
-            output_docx_file, output_md_file]
-        pandoc_proc = subprocess.Popen(args=pandoc_cmd)
-        pandoc_exit_code = pandoc_proc.wait()
-        if pandoc_exit_code != 0:
-            raise subprocess.CalledProcessError(pandoc_exit_code, pandoc_cmd,
-                output=None)
-
-        # Generate the pdf document using LibreOffice Writer
-        lowriter_cmd = [ReportGenerator.TOOL_LOWRITER, "--headless",
-            "--convert-to", "pdf:writer_pdf_Export", "--outdir", output_dir,
-            output_docx_file]
-        lowriter_proc = subprocess.Popen(args=lowriter_cmd)
-        lowriter_exit_code = lowriter_proc.wait()
-        if lowriter_exit_code != 0:
-            raise subprocess.CalledProcessError(lowriter_exit_code,
-                lowriter_cmd, output=None)
+        # lowriter names the pdf after the docx file
+        lowriter_pdf_file = output_filename + ReportGenerator.PDF_EXT
+
+        cached_file = lambda ext: None
+        if cache_dir is not None:
+            cache_key = self.get_pdf_cache_key(author, email, report_number)
+            cached_file = lambda ext: os.path.join(cache_dir, cache_key + ext)
+        def from_cache(output_file, ext):
+            if cached_file(ext) is None or not os.path.exists(cached_file(ext)):
+                return False
+            shutil.copyfile(cached_file(ext), output_file)
+            return True
+        def to_cache(output_file, ext):
+            # Reports with the same inputs may be generated concurrently, so
+            # each copies to its own temporary file before renaming it
+            if cached_file(ext) is not None:
+                with tempfile.NamedTemporaryFile(dir=cache_dir,
+                    delete=False) as cache_stream:
+                    with open(output_file, "rb") as output_stream:
+                        shutil.copyfileobj(output_stream, cache_stream)
+                os.rename(cache_stream.name, cached_file(ext))
+
+        timings = []
+        def run_stage(name, output_file, ext, body):
+            if from_cache(output_file, ext):
+                timings.append((name, None))
+                return
+            start = time.time()
+            body()
+            timings.append((name, time.time() - start))
+            to_cache(output_file, ext)
+
+        def write_markdown():
+            markdown_title = ""
+            markdown_body = ""
+            with open(ReportGenerator.MARKDOWN_TEMPLATE, "r") as \
+                markdown_stream:
+                markdown_title = markdown_stream.readline().strip()
+                markdown_body = markdown_stream.read().strip()
+
+            with self.open_output(output_md_file) as self.output_stream:
+                self.println(markdown_title)
+                self.println("")
+                self.print_md_metadata(author, email, report_number)
+                self.println("")
+                self.println(markdown_body)
+                self.println("")
+                self.print_md_summary()
+                self.print_md_detailed()
+
+        def run_pandoc():
+            # Generate docx document using pandoc
+            pandoc_cmd = [ReportGenerator.TOOL_PANDOC, "-S",
+                "--reference-docx", ReportGenerator.PANDOC_DOCX_TEMPLATE,
+                "-f", "markdown+multiline_tables", "--number-sections", "-o",
+                output_docx_file, output_md_file]
+            pandoc_proc = subprocess.Popen(args=pandoc_cmd)
+            pandoc_exit_code = pandoc_proc.wait()
+            if pandoc_exit_code != 0:
+                raise subprocess.CalledProcessError(pandoc_exit_code,
+                    pandoc_cmd, output=None)
+
+        def run_lowriter():
+            # Generate the pdf document using LibreOffice Writer. Each run
+            # gets its own user profile, as concurrent instances sharing a
+            # profile fail to start.
+            profile_dir = tempfile.mkdtemp()
+            try:
+                lowriter_cmd = [ReportGenerator.TOOL_LOWRITER,
+                    "-env:UserInstallation=file://" + profile_dir,
+                    "--headless", "--convert-to", "pdf:writer_pdf_Export",
+                    "--outdir", output_dir, output_docx_file]
+                lowriter_proc = subprocess.Popen(args=lowriter_cmd)
+                lowriter_exit_code = lowriter_proc.wait()
+                if lowriter_exit_code != 0:
+                    raise subprocess.CalledProcessError(lowriter_exit_code,
+                        lowriter_cmd, output=None)
+            finally:
+                shutil.rmtree(profile_dir, ignore_errors=True)
+            if lowriter_pdf_file != output_pdf_file:
+                os.rename(lowriter_pdf_file, output_pdf_file)
+
+        # Each stage only runs if its own output is not cached, and a cached
+        # pdf makes the earlier stages unnecessary
+        if from_cache(output_pdf_file, ReportGenerator.PDF_EXT):
+            from_cache(output_md_file, ReportGenerator.MD_EXT)
+            from_cache(output_docx_file, ReportGenerator.DOCX_EXT)
+            return [("pdf", None)]
+        if not from_cache(output_docx_file, ReportGenerator.DOCX_EXT):
+            run_stage("markdown", output_md_file, ReportGenerator.MD_EXT,
+                write_markdown)
+            run_stage("pandoc", output_docx_file, ReportGenerator.DOCX_EXT,
+                run_pandoc)
+        else:
+            from_cache(output_md_file, ReportGenerator.MD_EXT)
+            timings.append(("pandoc", None))
+        run_stage("lowriter", output_pdf_file, ReportGenerator.PDF_EXT,
+            run_lowriter)
+        return timings
+
+    @staticmethod
+    def print_pdfs(jobs, author, email, report_number, num_workers=1,
+                   cache_dir=None):
+        """Generate several pdf reports concurrently. jobs is a list of
+        (ReportGenerator, output pdf file) pairs, processed by a pool of
+        num_workers threads, each of which drives the external tools for one
+        report at a time. The time taken by each stage is printed as each
+        report completes."""
+        if cache_dir is not None and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+        def run_job(job):
+            reporter, output_pdf_file = job
+            start = time.time()
+            timings = reporter.print_pdf(output_pdf_file, author, email,
+                report_number, cache_dir)
+            return output_pdf_file, timings, time.time() - start
+
+        pool = ThreadPool(max(1, min(num_workers, len(jobs))))
+        try:
+            for output_pdf_file, timings, total in \
+                pool.imap_unordered(run_job, jobs):
+                print "Wrote '{0}' in {1:.2f}s ({2})".format(
+                    output_pdf_file, total, ", ".join(
+                    "{0}: {1}".format(stage, "cached" if seconds is None
+                        else "{0:.2f}s".format(seconds))
+                    for stage, seconds in timings))
+        finally:
+            pool.close()
+            pool.join()
+
+    def print_html(self, output_html_file, author, email, report_number):
+        """Write a self-contained html report. The tables are embedded as
+        gzip compressed JSON and rendered by the browser, which only creates
+        the rows that are scrolled into view. Log excerpts are added to the
+        failed tests as a last column, shown in full when a row is
+        clicked."""
+        passed, failed, skipped = self.extract_summary()
+        failed_tests, passed_tests, skipped_tests = self.extract_detailed()
+
+        make_section = lambda title, table: {
+            "title": title,
+            "keys": table.keys,
+            "rows": table.rows,
+            "omitted": len(table) - len(table.rows),
+        }
+        failed_section = make_section("Failed tests", failed_tests)
+        log_excerpts = self.extract_log_excerpts(failed_tests)
+        if log_excerpts:
+            failed_section["keys"] = list(failed_tests.keys) + ["Log excerpt"]
+            failed_section["details"] = len(failed_tests.keys)
+            failed_section["rows"] = [row + ("(log file not found)"
+                    if excerpt is None else
+                    "\n".join(excerpt).decode("utf-8", "replace"),)
+                for row, (_, _, excerpt) in zip(failed_tests.rows,
+                    log_excerpts)]
+        report = {
+            "summary": [
+                ["Document number", report_number],
+                ["Date of issue", time.strftime("%d/%m/%Y")],
+                ["Author", "{0} ({1})".format(author, email)],
+                ["Total tests", passed + failed + skipped],
+                ["Total passed", passed],
+                ["Total failed", failed],
+                ["Total skipped", skipped],
+            ],
+            "tables": [
+                make_section("Failures grouped by cause",
+                    self.extract_failure_clusters()),
+                failed_section,
+                make_section("Skipped tests", skipped_tests),
+                make_section("Passed tests", passed_tests),
+            ],
+        }
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        report_data = compressor.compress(
+            json.dumps(report, separators=(",", ":")))
+        report_data += compressor.flush()
+
+        with open(ReportGenerator.HTML_TEMPLATE, "r") as template_stream:
+            template = template_stream.read()
+        with self.open_output(output_html_file) as output_stream:
+            output_stream.write(template
+                .replace("@TITLE@", ReportGenerator.HTML_TITLE)
+                .replace("@REPORT_DATA@", base64.b64encode(report_data)))
+
+    @staticmethod
+    def xml_text(value):
+        value = value.decode("utf-8", "replace").encode("utf-8")
+        return ReportGenerator.XML_INVALID_PATTERN.sub("?", value)
+
+    def print_junit(self, output_file):
+        """Write the outcome file of this report in JUnit XML format, for
+        the test result pages of Jenkins. Rows are written as they are read:
+        each run of consecutive rows of the same component and test suite
+        becomes a testsuite element, so memory use does not depend on the
+        size of the outcome file. As the number of tests of a testsuite is
+        only known once it has been written, testsuite elements carry no
+        counts, which Jenkins computes from the testcase elements. Returns
+        the number of testsuite and testcase elements written."""
+        xml_text = ReportGenerator.xml_text
+        num_suites = 0
+        num_cases = 0
+        # The same few causes are repeated over many rows, so their escaped
+        # forms are cached, in a cache of bounded size
+        causes = {}
+        with self.open_output(output_file) as output_stream:
+            write = output_stream.write
+            write('<?xml version="1.0" encoding="UTF-8"?>\n<testsuites>\n')
+            current = None
+            current_class = None
+            for fields in self.read_outcomes(self.csv_file):
+                result = fields[4]
+                if result not in ReportGenerator.RESULT_CODES:
+                    continue
+                if (fields[1], fields[2]) != current:
+                    if current is not None:
+                        write('</testsuite>\n')
+                    current = (fields[1], fields[2])
+                    num_suites += 1
+                    write('<testsuite name={0}>\n'.format(quoteattr(
+                        xml_text("{0}.{1}".format(*current)))))
+                if fields[:3] != current_class:
+                    # Jenkins shows the test cases of each test suite under
+                    # the platform and component they ran on
+                    current_class = fields[:3]
+                    testcase_start = '<testcase classname={0} name='.format(
+                        quoteattr(xml_text("{0}.{1}.{2}".format(*fields))))
+                num_cases += 1
+                write(testcase_start + quoteattr(xml_text(fields[3])))
+                if result == ReportGenerator.TEST_RESULT_PASS:
+                    write('/>\n')
+                    continue
+                cause = causes.get((result, fields[5]))
+                if cause is None:
+                    if len(causes) >= ReportGenerator.JUNIT_CAUSE_CACHE_SIZE:
+                        causes.clear()
+                    element = "failure" \
+                        if result == ReportGenerator.TEST_RESULT_FAIL \
+                        else "skipped"
+                    text = xml_text(fields[5])
+                    cause = causes[(result, fields[5])] = \
+                        '>\n<{0} message={1}>{2}</{0}>\n</testcase>\n'.format(
+                        element, quoteattr(text), escape(text))
+                write(cause)
+            if current is not None:
+                write('</testsuite>\n')
+            write('</testsuites>\n')
+        return num_suites, num_cases
 
     def print_md_metadata(self, author, email, report_number):
-        table_keys = ["key", "val"]
-        table_data = {"key": ["Document number",
-                              "Division",
-                              "Date of issue",
-                              "Author",
-                              "Confidentiality"],
-                      "val": [report_number,
-                              ReportGenerator.ARM_DIVISION,
-                              time.strftime("%d/%m/%Y"),
-                              "{0} ({1})".format(author, email),
-                              ReportGenerator.REPORT_CONFIDENTIALITY]}
-
-        self.print_md_table(table_keys, table_data, headerless=True)
+        table = ReportTable(["key", "val"])
+        table.add_row("Document number", report_number)
+        table.add_row("Division", ReportGenerator.ARM_DIVISION)
+        table.add_row("Date of issue", time.strftime("%d/%m/%Y"))
+        table.add_row("Author", "{0} ({1})".format(author, email))
+        table.add_row("Confidentiality",
+            ReportGenerator.REPORT_CONFIDENTIALITY)
+
+        self.print_md_table(table, headerless=True)
         self.println("")
 
     def print_md_summary(self):
@@ -292,89 +1455,361 @@ class ReportGenerator:
         self.println("## Test Report Summary")
         self.println("")
 
-        table_keys = ["", "Total"]
-        table_data = {"": [ReportGenerator.TEST_RESULT_PASS,
-                           ReportGenerator.TEST_RESULT_FAIL,
-                           ReportGenerator.TEST_RESULT_SKIP,
-                           "Tests"],
-                      "Total": [passed,
-                                failed,
-                                skipped,
-                                passed + failed + skipped]}
-        self.print_md_table(table_keys, table_data)
+        table = ReportTable(["", "Total"])
+        table.add_row(ReportGenerator.TEST_RESULT_PASS, passed)
+        table.add_row(ReportGenerator.TEST_RESULT_FAIL, failed)
+        table.add_row(ReportGenerator.TEST_RESULT_SKIP, skipped)
+        table.add_row("Tests", passed + failed + skipped)
+        self.print_md_table(table)
         self.println("")
 
     def print_md_detailed(self):
-        failed_keys, failed_tests, passed_keys, passed_tests, skipped_keys, \
-            skipped_tests = self.extract_detailed()
+        failed_tests, passed_tests, skipped_tests = self.extract_detailed()
 
         self.println("## Test Report Detailed Overview")
         self.println("")
 
+        self.println("### Failures grouped by cause")
+        self.println("")
+        if len(failed_tests) < 1:
+            self.println("There are no failed tests")
+        else:
+            self.print_md_table(self.extract_failure_clusters())
+        self.println("")
+
         self.println("### Failed tests")
         self.println("")
-        if len(failed_tests[failed_keys[0]]) < 1:
+        if len(failed_tests) < 1:
             self.println("There are no failed tests")
         else:
-            self.print_md_table(failed_keys, failed_tests)
+            self.print_md_table(failed_tests)
         self.println("")
 
+        log_excerpts = self.extract_log_excerpts(failed_tests)
+        if log_excerpts:
+            self.println("### Logs of the failed tests")
+            self.println("")
+            for test, log_file, excerpt in log_excerpts:
+                self.println("{0} (`{1}`):".format(test, log_file or "no log"))
+                self.println("")
+                self.println("```")
+                if excerpt is None:
+                    self.println("(log file not found)")
+                for line in excerpt or []:
+                    self.println(line)
+                self.println("```")
+                self.println("")
+
         self.println("### Skipped tests")
         self.println("")
-        if len(skipped_tests[skipped_keys[0]]) < 1:
+        if len(skipped_tests) < 1:
             self.println("There are no skipped tests")
         else:
-            self.print_md_table(skipped_keys, skipped_tests)
+            self.print_md_table(skipped_tests)
         self.println("")
 
         self.println("### Passed tests")
         self.println("")
-        if len(passed_tests[passed_keys[0]]) < 1:
+        if len(passed_tests) < 1:
             self.println("There are no passed tests")
         else:
-            self.print_md_table(passed_keys, passed_tests)
+            self.print_md_table(passed_tests)
         self.println("")
 
-    def print_md_table(self, keys, data, headerless=False):
-        format_val = lambda width, val: str("{:" + str(width) +
-            "} ").format(val)
-        format_header = lambda key: format_val(col_widths[key], key)
-        format_body = lambda key: format_val(col_widths[key], data[key][i])
-        make_table_divider = lambda: " ".join(map(
-            lambda l: (l + 1) * '-', [col_widths[key] for key in keys]))
-
-        # Find out the width of each column in the table
-        col_widths = {}
-        for key in keys:
-            col_widths[key] = max(len(str(val)) for val in [key] + data[key])
+    def print_md_table(self, table, headerless=False):
+        write = self.output_stream.write
+        divider = " ".join((width + 1) * "-" for width in table.widths) + \
+            os.linesep
+        row_format = " ".join("{" + str(i) + ":" + str(width) + "} "
+            for i, width in enumerate(table.widths)) + os.linesep
+        if headerless:
+            header = divider
+        else:
+            header = divider + row_format.format(*table.keys) + divider
+        page_rows = self.table_page_rows
 
         # Print the table header
-        self.println(make_table_divider())
-        if not headerless:
-            self.println(" ".join(map(format_header, keys)))
-            self.println(make_table_divider())
+        write(header)
 
-        num_tests = len(data[keys[0]])
-        for i in range(num_tests):
-            if i > 0:
-                self.println("")
-            self.println(" ".join(map(format_body, keys)))
+        for i, row in enumerate(table.rows):
+            if page_rows and i > 0 and i % page_rows == 0:
+                # Close the current table and start a new one
+                write(divider + os.linesep + header)
+            elif i > 0:
+                write(os.linesep)
+            write(row_format.format(*row))
 
         # Add the end of table
-        self.println(make_table_divider())
+        write(divider)
+        self.print_omitted_rows(table)
+
+class OutcomeAggregator(object):
+    """Running totals of outcome files that are still being written. Each
+    file is read from where the previous scan stopped, up to its last
+    complete line, so every row is read once however often the files are
+    scanned, and the report can be rewritten as soon as new rows arrive.
+    Outcome files are expected to only grow. Once they are complete, a
+    final scan also reads their last line if it has no trailing newline."""
+
+    CHUNK_SIZE = 1 << 20
+
+    def __init__(self, reporter):
+        self.reporter = reporter
+        # File path -> offset of the first byte not read yet
+        self.offsets = {}
+        self.num_rows = 0
+        # Result -> count
+        self.totals = dict((result, 0) for result in
+            ReportGenerator.RESULT_CODES)
+        # Component -> [passed, failed, skipped]
+        self.components = {}
+        self.failed_tests = ReportTable([ReportGenerator.OUTCOME_PLATFORM,
+            ReportGenerator.OUTCOME_COMPONENT, ReportGenerator.OUTCOME_SUITE,
+            ReportGenerator.OUTCOME_CASE, ReportGenerator.OUTCOME_CAUSE],
+            reporter.max_table_rows)
+
+    def add_row(self, fields):
+        result = fields[4]
+        if result not in self.totals:
+            return
+        self.num_rows += 1
+        self.totals[result] += 1
+        counts = self.components.get(fields[1])
+        if counts is None:
+            counts = self.components[fields[1]] = [0, 0, 0]
+        if result == ReportGenerator.TEST_RESULT_PASS:
+            counts[0] += 1
+        elif result == ReportGenerator.TEST_RESULT_FAIL:
+            counts[1] += 1
+            self.failed_tests.add_row(fields[0], fields[1], fields[2],
+                fields[3], fields[5])
+        else:
+            counts[2] += 1
+
+    def add_lines(self, data, num_fields):
+        for line in data.splitlines():
+            fields = line.split(ReportGenerator.OUTCOME_DELIMITER,
+                num_fields - 1)
+            if len(fields) == num_fields:
+                self.add_row(fields)
+
+    def ingest(self, file_path, final=False):
+        """Read the complete lines added to an outcome file since it was
+        last read, and if final is set, the last line even if it is not
+        complete. Returns the number of bytes read."""
+        offset = self.offsets.get(file_path, 0)
+        size = os.path.getsize(file_path)
+        if size < offset:
+            print >> sys.stderr, \
+                "'{0}' shrank from {1} to {2} bytes, ignoring it".format(
+                    file_path, offset, size)
+            self.offsets[file_path] = size
+            return 0
+        if size == offset:
+            return 0
+        num_fields = len(ReportGenerator.OUTCOME_FIELDS)
+        read = 0
+        partial = ""
+        with open(file_path, "rb") as outcome_stream:
+            outcome_stream.seek(offset)
+            while offset + read + len(partial) < size:
+                data = partial + outcome_stream.read(min(
+                    OutcomeAggregator.CHUNK_SIZE,
+                    size - offset - read - len(partial)))
+                # A partial last line is read again once it is complete
+                end = data.rfind("\n") + 1
+                partial = data[end:]
+                if end == 0:
+                    continue
+                self.add_lines(data[:end], num_fields)
+                read += end
+        if final and partial:
+            self.add_lines(partial, num_fields)
+            read += len(partial)
+        self.offsets[file_path] = offset + read
+        return read
+
+    def scan(self, directory, pattern, final=False):
+        """Ingest the new rows of the files of directory matching pattern.
+        Returns the number of bytes read."""
+        read = 0
+        for name in sorted(os.listdir(directory)):
+            if fnmatch.fnmatch(name, pattern):
+                read += self.ingest(os.path.join(directory, name), final)
+        return read
+
+    def write_report(self, output_file):
+        """Rewrite the ascii report. The report is written next to
+        output_file and renamed over it, so readers never see a partial
+        report."""
+        reporter = self.reporter
+        components = ReportTable([ReportGenerator.OUTCOME_COMPONENT,
+            "Passed", "Failed", "Skipped"])
+        for component in sorted(self.components):
+            components.add_row(component, *self.components[component])
+
+        with reporter.open_output(output_file + ".tmp") as \
+            reporter.output_stream:
+            reporter.println("Test Outcome Summary for {0} files, as of "
+                "{1}".format(len(self.offsets),
+                time.strftime("%Y-%m-%d %H:%M:%S")))
+            reporter.println("Total tests:", self.num_rows)
+            reporter.println("Total passed:",
+                self.totals[ReportGenerator.TEST_RESULT_PASS])
+            reporter.println("Total failed:",
+                self.totals[ReportGenerator.TEST_RESULT_FAIL])
+            reporter.println("Total skipped:",
+                self.totals[ReportGenerator.TEST_RESULT_SKIP])
+            reporter.println("")
+            reporter.println("Test cases per component:")
+            reporter.print_ascii_table(components)
+            reporter.println("")
+            reporter.println("Failed tests:")
+            reporter.print_ascii_table(self.failed_tests)
+            reporter.println("")
+        os.rename(output_file + ".tmp", output_file)
+
+    def watch(self, directory, pattern, output_file, interval, idle_time=0,
+              until_file=None):
+        """Scan directory every interval seconds and rewrite the report
+        when new rows were read. Stops once until_file exists, after a last
+        scan, or once no rows have arrived for idle_time seconds. Without
+        until_file, an idle_time of 0 makes a single scan. The files are
+        taken to be complete when it stops, so their last lines are read
+        even without a trailing newline."""
+        last_change = time.time()
+        self.write_report(output_file)
+        while True:
+            finished = until_file is not None and os.path.exists(until_file)
+            if self.scan(directory, pattern):
+                last_change = time.time()
+                self.write_report(output_file)
+            idle = time.time() - last_change
+            if finished or (until_file is None or idle_time > 0) and \
+                idle >= idle_time:
+                if self.scan(directory, pattern, final=True):
+                    self.write_report(output_file)
+                return
+            time.sleep(interval)
 
 def main(args):
     # This is just for safety to ensure that we do not misinterpret any paths
     abspath = lambda path: os.path.abspath(os.path.expanduser(path))
 
-
-    reporter = ReportGenerator(abspath(args.csv_file), args.csv_delimiter)
+    make_reporter = lambda csv_file: ReportGenerator(abspath(csv_file),
+        args.csv_delimiter, args.max_table_rows, args.table_page_rows,
+        args.log_excerpt_lines,
+        abspath(args.log_dir) if args.log_dir else None)
+
+    if args.sqlite_file is not None:
+        database_file = abspath(args.sqlite_file)
+        if args.csv_file:
+            for outcome_file, count in ReportGenerator.export_sqlite(
+                [abspath(csv_file) for csv_file in args.csv_file],
+                database_file):
+                print "Loaded {0} outcomes from '{1}'".format(count,
+                    outcome_file)
+        if args.query is not None:
+            make_reporter(database_file).print_ascii_query(database_file,
+                args.query, abspath(args.output_ascii_file)
+                if args.output_ascii_file else None)
+        return
+    if args.query is not None:
+        raise Exception("A query requires an outcome database (--sqlite)")
+    if args.watch_dir is not None:
+        if args.output_ascii_file is None:
+            raise Exception("Watching outcome files requires an ascii output "
+                "file")
+        print "Writing the outcomes of '{0}' to '{1}' as they arrive".format(
+            os.path.join(args.watch_dir, args.watch_pattern),
+            args.output_ascii_file)
+        aggregator = OutcomeAggregator(make_reporter(args.watch_dir))
+        aggregator.watch(abspath(args.watch_dir), args.watch_pattern,
+            abspath(args.output_ascii_file), args.watch_interval,
+            args.watch_idle_time,
+            abspath(args.watch_until) if args.watch_until else None)
+        print "DONE"
+        return
+    if not args.csv_file:
+        raise Exception("An input file is required (-f)")
+    if args.flaky:
+        if args.output_ascii_file is None:
+            raise Exception("A flaky test report requires an ascii output "
+                "file")
+        print "Writing flaky test report to '{0}'".format(
+            args.output_ascii_file)
+        outcome_files = [abspath(csv_file) for csv_file in args.csv_file]
+        make_reporter(args.csv_file[-1]).print_ascii_flaky(outcome_files,
+            abspath(args.output_ascii_file))
+        print "DONE"
+        return
+    if len(args.csv_file) > 1:
+        # Several reports can only be generated in pdf format
+        if args.output_pdf_file is None or \
+            len(args.output_pdf_file) != len(args.csv_file) or \
+            args.output_ascii_file is not None or \
+            args.output_html_file is not None or \
+            args.baseline_file is not None or args.coverage or \
+            args.select_components or args.output_junit_file is not None:
+            raise Exception("Several input files require exactly one pdf "
+                "output file each and no other output")
+    elif args.output_pdf_file is not None and len(args.output_pdf_file) > 1:
+        raise Exception("Several pdf output files require one input file "
+            "each")
+
+    reporter = make_reporter(args.csv_file[0])
+    if args.baseline_file is not None:
+        if args.output_ascii_file is None:
+            raise Exception("A diff report requires an ascii output file")
+        print "Writing diff against '{0}' to '{1}'".format(
+            args.baseline_file, args.output_ascii_file)
+        reporter.print_ascii_diff(abspath(args.baseline_file),
+            abspath(args.output_ascii_file))
+        print "DONE"
+        return
+    if args.coverage:
+        if args.output_ascii_file is None:
+            raise Exception("A coverage report requires an ascii output file")
+        print "Writing coverage report to '{0}'".format(
+            args.output_ascii_file)
+        reporter.print_ascii_coverage(abspath(args.output_ascii_file))
+        print "DONE"
+        return
+    if args.select_components:
+        if args.output_ascii_file is None:
+            raise Exception("A component selection report requires an ascii "
+                "output file")
+        print "Writing component selection report to '{0}'".format(
+            args.output_ascii_file)
+        reporter.print_ascii_component_selection(
+            abspath(args.output_ascii_file),
+            abspath(args.component_durations)
+            if args.component_durations else None)
+        print "DONE"
+        return
+    if args.output_junit_file is not None:
+        print "Writing JUnit report to '{0}'".format(args.output_junit_file)
+        num_suites, num_cases = reporter.print_junit(
+            abspath(args.output_junit_file))
+        print "Wrote {0} test cases in {1} test suites".format(num_cases,
+            num_suites)
+        print "DONE"
+        return
     if args.output_ascii_file is not None:
         print "Writing ascii report to '{0}'".format(args.output_ascii_file)
         reporter.print_ascii(abspath(args.output_ascii_file))
     if args.output_pdf_file is not None:
-        print "Writing pdf report to '{0}'".format(args.output_pdf_file)
-        reporter.print_pdf(abspath(args.output_pdf_file), args.author,
+        print "Writing pdf reports to '{0}'".format(
+            "', '".join(args.output_pdf_file))
+        jobs = [(make_reporter(csv_file), abspath(output_pdf_file))
+                for csv_file, output_pdf_file
+                in zip(args.csv_file, args.output_pdf_file)]
+        ReportGenerator.print_pdfs(jobs, args.author, args.email,
+            args.report_number, args.jobs,
+            abspath(args.cache_dir) if args.cache_dir else None)
+    if args.output_html_file is not None:
+        print "Writing html report to '{0}'".format(args.output_html_file)
+        reporter.print_html(abspath(args.output_html_file), args.author,
             args.email, args.report_number)
     print "DONE"
 
@@ -384,18 +1819,103 @@ def parse_cmdline_args(args):
         "reports.")
 
     # Add the script options
-    parser.add_argument("-f", "--csv-file", action="store", type=str,
-        required=True, help="Path to a file in CSV format containing the raw "
-        "test output", metavar="PATH")
+    parser.add_argument("-f", "--csv-file", action="append", type=str,
+        required=False, help="Path to a file in CSV format containing the raw "
+        "test output. May be repeated together with -p to generate several "
+        "pdf reports, or with --flaky or --sqlite", metavar="PATH")
     parser.add_argument("-d", "--csv-delimiter", action="store",
         type=str, required=False, default=",", help="The separator character "
         "in the CSV file", metavar="DELIM")
     parser.add_argument("-a", "--output-ascii-file", action="store", type=str,
         required=False, default=None, help="File where the processed data "
         "will be written in ascii format", metavar="PATH")
-    parser.add_argument("-p", "--output-pdf-file", action="store", type=str,
-        required=False, default=None, help="File where the processed data "
-        "will be written in pdf format", metavar="PATH")
+    parser.add_argument("-p", "--output-pdf-file", action="append",
+        type=str, required=False, default=None, help="File where the "
+        "processed data will be written in pdf format. May be repeated, once "
+        "per -f", metavar="PATH")
+    parser.add_argument("-j", "--jobs", action="store", type=int,
+        required=False, default=1, help="Number of pdf reports to generate "
+        "concurrently", metavar="NUMBER")
+    parser.add_argument("--cache-dir", action="store", type=str,
+        required=False, default=None, help="Directory where the intermediate "
+        "and final pdf report files are cached, so that reports whose inputs "
+        "have not changed are not regenerated", metavar="PATH")
+    parser.add_argument("-w", "--output-html-file", action="store",
+        type=str, required=False, default=None, help="File where the "
+        "processed data will be written in html format", metavar="PATH")
+    parser.add_argument("-x", "--output-junit-file", action="store",
+        type=str, required=False, default=None, help="Read the file passed "
+        "with -f as an outcome file and write it in JUnit XML format to "
+        "PATH", metavar="PATH")
+    parser.add_argument("-b", "--baseline-file", action="store", type=str,
+        required=False, default=None, help="Outcome file of an earlier run. "
+        "When given, the file passed with -f is read as an outcome file and "
+        "the ascii report lists the test cases whose result changed since "
+        "the earlier run", metavar="PATH")
+    parser.add_argument("-c", "--coverage", action="store_true",
+        required=False, default=False, help="Read the file passed with -f "
+        "as an outcome file and write an ascii report of which components "
+        "executed each test case, listing the test cases that were never "
+        "executed")
+    parser.add_argument("-s", "--select-components", action="store_true",
+        required=False, default=False, help="Read the file passed with -f "
+        "as an outcome file and write an ascii report of a small set of "
+        "components that together execute every test case executed by all "
+        "components")
+    parser.add_argument("--flaky", action="store_true", required=False,
+        default=False, help="Read the files passed with -f as the outcome "
+        "files of successive runs, oldest first, and write an ascii report "
+        "of the test cases whose result changes between runs")
+    parser.add_argument("--sqlite", dest="sqlite_file", action="store",
+        type=str, required=False, default=None, help="SQLite database of "
+        "outcomes. The files passed with -f are read as outcome files and "
+        "loaded into it, replacing the outcomes previously loaded from the "
+        "same files", metavar="PATH")
+    parser.add_argument("-q", "--query", action="store", type=str,
+        required=False, default=None, help="SQL query to run on the "
+        "database given with --sqlite, for example on its outcome_view "
+        "view. The result is written to the ascii output file, or else "
+        "printed", metavar="SQL")
+    parser.add_argument("--watch", dest="watch_dir", action="store",
+        type=str, required=False, default=None, help="Directory where the "
+        "outcome files of the jobs arrive or are appended to. The ascii "
+        "report summarising them is rewritten whenever new rows are read",
+        metavar="PATH")
+    parser.add_argument("--watch-pattern", action="store", type=str,
+        required=False, default="*-outcome.csv", help="Names of the outcome "
+        "files in the --watch directory (default: *-outcome.csv)",
+        metavar="GLOB")
+    parser.add_argument("--watch-interval", action="store", type=float,
+        required=False, default=2, help="Seconds between two scans of the "
+        "--watch directory (default: 2)", metavar="SECONDS")
+    parser.add_argument("--watch-idle-time", action="store", type=float,
+        required=False, default=0, help="Stop watching once no rows have "
+        "arrived for SECONDS (default: 0, scan once unless --watch-until is "
+        "given)", metavar="SECONDS")
+    parser.add_argument("--watch-until", action="store", type=str,
+        required=False, default=None, help="Stop watching once this file "
+        "exists, after a last scan", metavar="PATH")
+    parser.add_argument("--component-durations", action="store", type=str,
+        required=False, default=None, help="Job ranking CSV exported by "
+        "job_durations.py. With -s, components are selected by test cases "
+        "executed per second of their p90 duration rather than by test "
+        "cases executed", metavar="PATH")
+    parser.add_argument("--max-table-rows", action="store", type=int,
+        required=False, default=None, help="Maximum number of rows to write "
+        "in the tables of test cases, the remaining rows are only counted",
+        metavar="NUMBER")
+    parser.add_argument("--log-excerpt-lines", action="store", type=int,
+        required=False, default=0, help="Include in the ascii and pdf "
+        "reports up to NUMBER lines of the log of each failed test: the lines "
+        "around the first error near the end of the log, or else its last "
+        "lines", metavar="NUMBER")
+    parser.add_argument("--log-dir", action="store", type=str,
+        required=False, default=None, help="Directory of the log files of "
+        "the failed tests, when it is not the directory of the CSV file or "
+        "the logs have moved since the tests ran", metavar="PATH")
+    parser.add_argument("--table-page-rows", action="store", type=int,
+        required=False, default=None, help="Repeat the table header every "
+        "NUMBER rows", metavar="NUMBER")
     parser.add_argument("-u", "--author", action="store", type=str,
         required=False, default="n/a", help="Author of the report",
         metavar="AUTHOR")
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+
+#  Copyright (c) 2026, Arm Limited, All Rights Reserved
+#  SPDX-License-Identifier: Apache-2.0
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+#  This file is part of Mbed TLS (https://www.trustedfirmware.org/projects/mbed-tls/)
+
+"""
+Keeps the job durations recorded in timestamps bundles in an SQLite
+database, and answers how long each job usually takes and whether it is
+getting slower.
+
+import adds bundles to the database. A build that is already in the
+database is skipped, so overlapping bundles can be imported repeatedly.
+stats prints the p50, p90 and p99 duration of each job in milliseconds,
+with its trend in milliseconds per day. export writes the jobs ranked by
+duration, as CSV or JSON, for the pipeline to start the longest jobs
+first.
+"""
+
+import argparse
+import csv
+import json
+import sqlite3
+import sys
+import time
+
+import timestamps_bundle
+from timestamps_bundle import UNSET
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY,
+    job TEXT NOT NULL,
+    branch TEXT NOT NULL,
+    pr INTEGER NOT NULL,
+    build INTEGER NOT NULL,
+    test_commit TEXT,
+    result TEXT,
+    UNIQUE (job, branch, pr, build)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    label TEXT NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE (label, name)
+);
+CREATE TABLE IF NOT EXISTS runs (
+    job_id INTEGER NOT NULL REFERENCES jobs (id),
+    build_id INTEGER NOT NULL REFERENCES builds (id),
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL,
+    inner_start INTEGER NOT NULL,
+    inner_end INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_job ON runs (job_id, start);
+"""
+
+DAY_MS = 24 * 60 * 60 * 1000
+EXPORT_FIELDS = ["label", "job", "runs", "p50", "p90", "p99",
+                 "trendPerDay"]
+
+
+class JobDurationDatabase(object):
+    """The job durations of the builds of the imported bundles."""
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        self.job_ids = dict(
+            ((label, name), job_id) for job_id, label, name in
+            self.connection.execute("SELECT id, label, name FROM jobs")
+        )
+
+    def close(self):
+        self.connection.close()
+
+    def get_job_id(self, label, name):
+        key = (label, name)
+        if key not in self.job_ids:
+            self.job_ids[key] = self.connection.execute(
+                "INSERT INTO jobs (label, name) VALUES (?, ?)", key
+            ).lastrowid
+        return self.job_ids[key]
+
+    def import_bundle(self, path):
+        """Adds the builds of a bundle that are not in the database yet, in
+        a single transaction. Returns the number of builds added and
+        skipped."""
+        added = skipped = 0
+        with self.connection:
+            for key, subtasks in timestamps_bundle.iter_builds(
+                    timestamps_bundle.read_bundle(path)):
+                first = subtasks[0]
+                cursor = self.connection.execute(
+                    "INSERT OR IGNORE INTO builds "
+                    "(job, branch, pr, build, test_commit, result) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    key + (first.test_commit, first.result)
+                )
+                if not cursor.rowcount:
+                    skipped += 1
+                    continue
+                added += 1
+                build_id = cursor.lastrowid
+                self.connection.executemany(
+                    "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?)",
+                    [(self.get_job_id(subtask.group, subtask.subtask),
+                      build_id, subtask.start, subtask.end,
+                      subtask.inner_start, subtask.inner_end)
+                     for subtask in subtasks
+                     if subtask.start != UNSET and subtask.end != UNSET]
+                )
+        return added, skipped
+
+    def get_duration_stats(self, inner=False, since=None, label=None,
+                           name=None):
+        """Returns a dictionary per job with its number of runs, p50, p90
+        and p99 duration in milliseconds, and the slope of the least
+        squares fit of its duration over time in milliseconds per day.
+        inner selects the duration of the inner part of the jobs; since
+        only keeps the runs that started from that time in milliseconds."""
+        if inner:
+            duration = "inner_end - inner_start"
+            conditions = ["inner_start != -1", "inner_end != -1"]
+        else:
+            duration = "end - start"
+            conditions = []
+        parameters = []
+        if since is not None:
+            conditions.append("start >= ?")
+            parameters.append(since)
+        if label is not None:
+            conditions.append("label = ?")
+            parameters.append(label)
+        if name is not None:
+            conditions.append("name = ?")
+            parameters.append(name)
+        query = (
+            "SELECT label, name, start, {} AS duration FROM runs "
+            "JOIN jobs ON jobs.id = runs.job_id {} "
+            "ORDER BY job_id, duration".format(
+                duration,
+                "WHERE " + " AND ".join(conditions) if conditions else ""
+            )
+        )
+        stats = []
+        current = None
+        starts = []
+        durations = []
+        for row_label, row_name, start, run_duration in \
+                self.connection.execute(query, parameters):
+            if (row_label, row_name) != current:
+                if current is not None:
+                    stats.append(self.summarize(current, starts, durations))
+                current = (row_label, row_name)
+                starts = []
+                durations = []
+            starts.append(start)
+            durations.append(run_duration)
+        if current is not None:
+            stats.append(self.summarize(current, starts, durations))
+        return stats
+
+    @staticmethod
+    def summarize(job, starts, durations):
+        count = len(durations)
+        trend = 0.0
+        if count > 1:
+            origin = min(starts)
+            days = [(start - origin) / DAY_MS for start in starts]
+            mean_day = sum(days) / count
+            mean_duration = sum(durations) / count
+            variance = sum((day - mean_day) ** 2 for day in days)
+            if variance:
+                trend = sum(
+                    (day - mean_day) * (duration - mean_duration)
+                    for day, duration in zip(days, durations)
+                ) / variance
+        return {
+            "label": job[0],
+            "job": job[1],
+            "runs": count,
+            "p50": timestamps_bundle.percentile(durations, 0.5),
+            "p90": timestamps_bundle.percentile(durations, 0.9),
+            "p99": timestamps_bundle.percentile(durations, 0.99),
+            "trendPerDay": round(trend),
+        }
+
+    def predict(self, label, name, fraction=0.9, inner=False):
+        """Returns the duration in milliseconds that the given fraction of
+        the runs of a job did not exceed, or None for an unknown job."""
+        durations = [
+            run_duration for (run_duration,) in self.connection.execute(
+                "SELECT {} AS duration FROM runs "
+                "JOIN jobs ON jobs.id = runs.job_id "
+                "WHERE label = ? AND name = ? {} ORDER BY duration".format(
+                    "inner_end - inner_start" if inner else "end - start",
+                    "AND inner_start != -1 AND inner_end != -1"
+                    if inner else ""
+                ),
+                (label, name)
+            )
+        ]
+        if not durations:
+            return None
+        return timestamps_bundle.percentile(durations, fraction)
+
+
+def get_stats(database, args):
+    since = None
+    if args.days is not None:
+        since = int(time.time() * 1000) - args.days * DAY_MS
+    stats = database.get_duration_stats(inner=args.inner, since=since,
+                                        label=args.label, name=args.job)
+    stats.sort(key=lambda job: (-job[args.sort_by], job["label"],
+                                job["job"]))
+    return stats
+
+
+def print_stats(database, args):
+    row_format = "{:>7} {:>10} {:>10} {:>10} {:>10}  {}\n"
+    sys.stdout.write(row_format.format(
+        "Runs", "p50", "p90", "p99", "Trend/day", "Job"
+    ))
+    for job in get_stats(database, args)[:args.top]:
+        sys.stdout.write(row_format.format(
+            job["runs"], job["p50"], job["p90"], job["p99"],
+            "{:+d}".format(job["trendPerDay"]),
+            "{}:{}".format(job["label"], job["job"])
+        ))
+
+
+def export_stats(database, args):
+    stats = get_stats(database, args)
+    with open(args.output_file, "w", newline="") as f:
+        if args.output_file.endswith(".json"):
+            json.dump({"jobs": stats}, f, indent=1)
+        else:
+            writer = csv.DictWriter(f, EXPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(stats)
+
+
+def import_bundles(database, args):
+    for path in args.bundles:
+        added, skipped = database.import_bundle(path)
+        print("{}: {} builds added, {} already imported".format(
+            path, added, skipped
+        ))
+
+
+def add_query_arguments(parser):
+    parser.add_argument(
+        "--inner", action="store_true",
+        help="use the duration of the inner part of the jobs "
+             "(innerEnd - innerStart)"
+    )
+    parser.add_argument(
+        "--days", type=int,
+        help="only use the runs of the last given number of days"
+    )
+    parser.add_argument("--label", help="only report jobs of this label")
+    parser.add_argument("--job", help="only report jobs of this name")
+    parser.add_argument(
+        "--sort-by", choices=["p50", "p90", "p99", "trendPerDay", "runs"],
+        default="p90",
+        help="rank the jobs by this value, largest first (default: p90)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "-d", "--database", default="job-durations.sqlite",
+        help="SQLite database file (default: job-durations.sqlite)"
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+    import_parser = subparsers.add_parser(
+        "import", help="add timestamps bundles to the database"
+    )
+    import_parser.add_argument(
+        "bundles", nargs="+",
+        help="timestamps-bundle.csv or .json files, possibly compressed"
+    )
+    import_parser.set_defaults(function=import_bundles)
+    stats_parser = subparsers.add_parser(
+        "stats", help="print the duration percentiles and trend of the jobs"
+    )
+    add_query_arguments(stats_parser)
+    stats_parser.add_argument(
+        "-n", "--top", type=int,
+        help="number of jobs to print (default: all)"
+    )
+    stats_parser.set_defaults(function=print_stats)
+    export_parser = subparsers.add_parser(
+        "export", help="write the jobs ranked by duration to a file"
+    )
+    add_query_arguments(export_parser)
+    export_parser.add_argument(
+        "output_file",
+        help="CSV file, or JSON file if its name ends with .json"
+    )
+    export_parser.set_defaults(function=export_stats)
+    args = parser.parse_args()
+    database = JobDurationDatabase(args.database)
+    try:
+        args.function(database, args)
+    finally:
+        database.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+
+#  Copyright (c) 2026, Arm Limited, All Rights Reserved
+#  SPDX-License-Identifier: Apache-2.0
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+#  This file is part of Mbed TLS (https://www.trustedfirmware.org/projects/mbed-tls/)
+
+"""
+Predicts the effect of node pools and job ordering policies on the CI, by
+replaying the builds recorded in timestamps-bundle.csv or .json files.
+
+Each build arrives when it started, and releases all of its jobs at once,
+as the parallel stages of gen_jobs.groovy do. A job needs one executor of
+its node label (the group of its timestamps) for the duration of its inner
+part (innerEnd - innerStart), or of the whole job if that was not
+recorded. The executors of each label are given by a JSON pools file,
+such as {"container-host": 40, "windows": 8, "*": 10} where "*" applies
+to the labels that are not listed. Labels without executors, or with
+null, have as many as they need.
+
+The waiting jobs of a label are started in the order of the policy:
+fifo: in the order they were released;
+longest-first: longest job first;
+critical-path-first: jobs with the least slack first, where the slack of
+a job is how much shorter it is than the longest job of its build.
+"""
+
+import argparse
+import collections
+import heapq
+import json
+import sys
+
+import timestamps_bundle
+from timestamps_bundle import UNSET, format_duration
+
+MAIN_GROUP = "main"
+POLICIES = ["fifo", "longest-first", "critical-path-first"]
+
+# A recorded build: arrival time, recorded latency and (label, duration)
+# of each job, in milliseconds
+Build = collections.namedtuple("Build", ["arrival", "latency", "jobs"])
+
+
+def load_builds(bundles):
+    builds = []
+    for bundle in bundles:
+        for _, subtasks in timestamps_bundle.iter_builds(
+                timestamps_bundle.read_bundle(bundle)):
+            arrival = end = None
+            jobs = []
+            for subtask in subtasks:
+                if subtask.start == UNSET or subtask.end == UNSET:
+                    continue
+                if arrival is None or subtask.start < arrival:
+                    arrival = subtask.start
+                end = max(end or subtask.end, subtask.end)
+                if subtask.group == MAIN_GROUP:
+                    continue
+                if subtask.inner_start != UNSET and \
+                   subtask.inner_end != UNSET:
+                    duration = subtask.inner_end - subtask.inner_start
+                else:
+                    duration = subtask.end - subtask.start
+                jobs.append((subtask.group, duration))
+            if jobs:
+                builds.append(Build(arrival, end - arrival, jobs))
+    builds.sort(key=lambda build: build.arrival)
+    return builds
+
+
+def load_pools(path):
+    with open(path) as f:
+        pools = json.load(f)
+    if not isinstance(pools, dict):
+        raise ValueError("{}: expected a JSON object".format(path))
+    for label, count in pools.items():
+        if count is None:
+            continue
+        if isinstance(count, bool) or not isinstance(count, int) or \
+           count < 1:
+            raise ValueError(
+                "{}: expected a number of executors of at least 1 for "
+                "'{}', got {}".format(path, label, json.dumps(count))
+            )
+    return pools
+
+
+def get_priority(policy, sequence, duration, slack):
+    if policy == "fifo":
+        return (sequence,)
+    elif policy == "longest-first":
+        return (-duration, sequence)
+    else:
+        return (slack, -duration, sequence)
+
+
+class SimulationResult(object):
+
+    def __init__(self, latencies, waits, busy, executors, span):
+        self.latencies = sorted(latencies)
+        # Label -> sorted queue waits
+        self.waits = {label: sorted(label_waits)
+                      for label, label_waits in waits.items()}
+        self.busy = busy
+        self.executors = executors
+        self.span = span
+
+
+def simulate(builds, pools, policy):
+    """Replays the builds on the executors of the pools. Arrivals are
+    taken in time order and job completions from a heap; after each
+    event, the label whose executors or queue changed starts as many
+    waiting jobs as it has free executors."""
+    default = pools.get("*")
+    free = {}
+    queues = collections.defaultdict(list)
+    finishes = []
+    build_ends = [build.arrival for build in builds]
+    waits = collections.defaultdict(list)
+    busy = collections.defaultdict(int)
+    sequence = 0
+    next_build = 0
+    now = builds[0].arrival if builds else 0
+
+    def dispatch(label):
+        queue = queues[label]
+        while queue and (free[label] is None or free[label] > 0):
+            _, index, duration, released = heapq.heappop(queue)
+            if free[label] is not None:
+                free[label] -= 1
+            waits[label].append(now - released)
+            busy[label] += duration
+            heapq.heappush(finishes, (now + duration, label, index))
+
+    while next_build < len(builds) or finishes:
+        if finishes and (next_build == len(builds) or
+                         finishes[0][0] <= builds[next_build].arrival):
+            now, label, index = heapq.heappop(finishes)
+            if free[label] is not None:
+                free[label] += 1
+            build_ends[index] = max(build_ends[index], now)
+            dispatch(label)
+        else:
+            build = builds[next_build]
+            now = build.arrival
+            longest = max(duration for _, duration in build.jobs)
+            labels = set()
+            for label, duration in build.jobs:
+                if label not in free:
+                    free[label] = pools.get(label, default)
+                sequence += 1
+                heapq.heappush(queues[label], (
+                    get_priority(policy, sequence, duration,
+                                 longest - duration),
+                    next_build, duration, now
+                ))
+                labels.add(label)
+            for label in labels:
+                dispatch(label)
+            next_build += 1
+    span = (max(build_ends) - builds[0].arrival) if builds else 0
+    executors = {label: pools.get(label, default) for label in free}
+    return SimulationResult(
+        [end - build.arrival for end, build in zip(build_ends, builds)],
+        waits, busy, executors, span
+    )
+
+
+def describe_latencies(latencies):
+    return [
+        format_duration(sum(latencies) / len(latencies)),
+        format_duration(timestamps_bundle.percentile(latencies, 0.5)),
+        format_duration(timestamps_bundle.percentile(latencies, 0.9)),
+        format_duration(latencies[-1]),
+    ]
+
+
+def print_report(output, builds, results):
+    write = output.write
+    row_format = "{:<24} {:<20} {:>10} {:>10} {:>10} {:>10}\n"
+    write("{} builds, {} jobs replayed\n\n".format(
+        len(builds), sum(len(build.jobs) for build in builds)
+    ))
+    write("Build latency\n")
+    write(row_format.format("Pools", "Policy", "Mean", "p50", "p90", "Max"))
+    write(row_format.format("recorded", "", *describe_latencies(
+        sorted(build.latency for build in builds)
+    )))
+    for pools_name, policy, result in results:
+        write(row_format.format(pools_name, policy,
+                                *describe_latencies(result.latencies)))
+
+    label_format = "{:<24} {:<20} {:>9} {:>11} {:>10} {:>10}  {}\n"
+    write("\nNode labels\n")
+    write(label_format.format("Pools", "Policy", "Executors", "Utilisation",
+                              "Mean wait", "p90 wait", "Label"))
+    for pools_name, policy, result in results:
+        for label in sorted(result.executors):
+            executors = result.executors[label]
+            waits = result.waits[label]
+            if executors is None or not result.span:
+                utilisation = ""
+            else:
+                utilisation = "{:.1f}%".format(
+                    100 * result.busy[label] / (executors * result.span)
+                )
+            write(label_format.format(
+                pools_name, policy,
+                "-" if executors is None else executors,
+                utilisation,
+                format_duration(sum(waits) / len(waits)),
+                format_duration(timestamps_bundle.percentile(waits, 0.9)),
+                label
+            ))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "bundles", nargs="+",
+        help="timestamps-bundle.csv or .json files, possibly compressed"
+    )
+    parser.add_argument(
+        "--pools", nargs="+", default=[],
+        help="JSON files giving the number of executors of each label, "
+             "each simulated in turn (default: unlimited executors)"
+    )
+    parser.add_argument(
+        "--policy", nargs="+", choices=POLICIES, default=POLICIES,
+        help="job ordering policies to simulate (default: all)"
+    )
+    parser.add_argument(
+        "-o", "--output-file",
+        help="file to write the report to (default: standard output)"
+    )
+    args = parser.parse_args()
+    builds = load_builds(args.bundles)
+    if not builds:
+        sys.exit("No build with recorded timestamps")
+    scenarios = []
+    for path in args.pools:
+        try:
+            scenarios.append((path, load_pools(path)))
+        except ValueError as e:
+            parser.error(str(e))
+    if not scenarios:
+        scenarios.append(("unlimited", {}))
+    results = [
+        (pools_name, policy, simulate(builds, pools, policy))
+        for pools_name, pools in scenarios
+        for policy in args.policy
+    ]
+    if args.output_file:
+        with open(args.output_file, "w") as output:
+            print_report(output, builds, results)
+    else:
+        print_report(sys.stdout, builds, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#  Copyright (c) 2026, Arm Limited, All Rights Reserved
+#  SPDX-License-Identifier: Apache-2.0
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+#  This file is part of Mbed TLS (https://www.trustedfirmware.org/projects/mbed-tls/)
+
+"""
+Reads the timestamps recorded by vars/analysis.groovy.
+
+gather_timestamps() archives them in timestamps-bundle.csv and
+timestamps-bundle.json. Both are read as a stream of Subtask records, one
+per subtask of each build, without loading the whole bundle in memory.
+Bundles compressed with gzip, bzip2 or xz are decompressed on the fly.
+Times are in milliseconds since the epoch, -1 when they were not recorded.
+"""
+
+import bz2
+import collections
+import csv
+import gzip
+import itertools
+import json
+import lzma
+
+BUILD_FIELDS = ["testCommit", "job", "branch", "pr", "build", "result"]
+TIMESTAMP_FIELDS = ["start", "end", "innerStart", "innerEnd"]
+
+Subtask = collections.namedtuple(
+    "Subtask",
+    ["test_commit", "job", "branch", "pr", "build", "result",
+     "group", "subtask", "start", "end", "inner_start", "inner_end"]
+)
+
+UNSET = -1
+JSON_CHUNK_SIZE = 1 << 16
+
+
+def open_text(path):
+    """Opens a possibly compressed text file for reading."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    elif path.endswith(".bz2"):
+        return bz2.open(path, "rt", encoding="utf-8")
+    elif path.endswith(".xz"):
+        return lzma.open(path, "rt", encoding="utf-8")
+    else:
+        return open(path, encoding="utf-8")
+
+
+def parse_time(value):
+    """Timestamps missing from a subtask are written as -1, null or
+    nothing, depending on the version of the Jenkins library."""
+    if value is None or value in ("", "null"):
+        return UNSET
+    return int(value)
+
+
+def parse_number(value):
+    if value is None or value in ("", "null"):
+        return -1
+    return int(value)
+
+
+def parse_text(value):
+    """The branch of pull request builds is written as null or nothing:
+    return '' for both, so that builds compare equal whatever the format of
+    their bundle."""
+    if value is None or value == "null":
+        return ""
+    return value
+
+
+def read_csv_bundle(stream):
+    reader = csv.reader(stream)
+    header = next(reader)
+    indexes = [header.index(field) for field in
+               BUILD_FIELDS + ["group", "subtask"] + TIMESTAMP_FIELDS]
+    for row in reader:
+        if not row:
+            continue
+        values = [row[index] for index in indexes]
+        yield Subtask(
+            values[0], values[1], parse_text(values[2]),
+            parse_number(values[3]), parse_number(values[4]), values[5],
+            values[6], values[7],
+            *[parse_time(value) for value in values[8:]]
+        )
+
+
+def iter_json_builds(stream):
+    """Yields the builds of a {"builds": [...]} document one at a time,
+    reading the stream in chunks."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    in_array = False
+    while True:
+        # Skip to the next value
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position < len(buffer):
+                break
+            chunk = stream.read(JSON_CHUNK_SIZE)
+            if not chunk:
+                return
+            buffer = buffer[position:] + chunk
+            position = 0
+        if not in_array:
+            start = buffer.find("[", position)
+            if start < 0:
+                buffer = buffer[position:]
+                position = len(buffer)
+                continue
+            in_array = True
+            position = start + 1
+            continue
+        if buffer[position] == "]":
+            return
+        try:
+            build, end = decoder.raw_decode(buffer, position)
+        except ValueError:
+            chunk = stream.read(JSON_CHUNK_SIZE)
+            if not chunk:
+                raise
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        position = end
+        yield build
+
+
+def read_json_bundle(stream):
+    for build in iter_json_builds(stream):
+        values = [build.get("testCommit"), build.get("job"),
+                  parse_text(build.get("branch")),
+                  parse_number(build.get("pr")),
+                  parse_number(build.get("build")), build.get("result")]
+        for group, tasks in build.get("subtasks", {}).items():
+            for subtask, timestamps in tasks.items():
+                yield Subtask(*(values + [group, subtask] + [
+                    parse_time(timestamps.get(field))
+                    for field in TIMESTAMP_FIELDS
+                ]))
+
+
+def read_bundle(path):
+    """Yields the subtasks of a timestamps-bundle.csv or .json file."""
+    stream = open_text(path)
+    name = path
+    for extension in (".gz", ".bz2", ".xz"):
+        if name.endswith(extension):
+            name = name[:-len(extension)]
+    if name.endswith(".json"):
+        reader = read_json_bundle(stream)
+    else:
+        reader = read_csv_bundle(stream)
+    try:
+        for subtask in reader:
+            yield subtask
+    finally:
+        stream.close()
+
+
+def build_key(subtask):
+    return (subtask.job, subtask.branch, subtask.pr, subtask.build)
+
+
+def iter_builds(subtasks):
+    """Groups the subtasks of each build. The bundles list the subtasks of
+    each build together, so only one build is held in memory at a time."""
+    for key, build_subtasks in itertools.groupby(subtasks, key=build_key):
+        yield key, list(build_subtasks)
+
+
+def describe_build(key):
+    job, branch, pr, build = key
+    if pr != -1:
+        return "{} PR-{} #{}".format(job, pr, build)
+    return "{} {} #{}".format(job, branch, build)
+
+
+def format_duration(milliseconds):
+    seconds = int(round(milliseconds / 1000))
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if hours:
+        return "{}h{:02}m{:02}s".format(hours, minutes, seconds)
+    return "{}m{:02}s".format(minutes, seconds)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of a sorted list."""
+    if not sorted_values:
+        return 0
+    index = int(round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+
+#  Copyright (c) 2026, Arm Limited, All Rights Reserved
+#  SPDX-License-Identifier: Apache-2.0
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+#  This file is part of Mbed TLS (https://www.trustedfirmware.org/projects/mbed-tls/)
+
+"""
+Measures the orchestration overhead of windows_testing.py on any platform.
+windows_testing.py runs a synthetic matrix of Visual Studio test runs
+against a generated source tree, using its fake toolchain driver, which
+simulates each build and test step with a fixed duration. For each number
+of parallel jobs, the script reports the wall clock time and throughput of
+the whole run, and how much of the time of each test run was spent outside
+of the simulated steps. Requires prettytable package.
+"""
+
+from prettytable import PrettyTable
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+WINDOWS_TESTING = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "windows_testing.py"
+)
+
+# A config.py that records the commands it is given in the config header
+FAKE_CONFIG_PY = """import sys
+with open("include/mbedtls/mbedtls_config.h", "a") as f:
+    f.write("// config.py " + " ".join(sys.argv[1:]) + "\\n")
+"""
+
+FAKE_SOURCE_TREE = {
+    os.path.join("scripts", "config.py"): FAKE_CONFIG_PY,
+    os.path.join("include", "mbedtls", "mbedtls_config.h"): "",
+    "CMakeLists.txt": "project(\"mbed TLS\" C)\n",
+    os.path.join("visualc", "VS2017", "mbedTLS.sln"): "",
+    os.path.join("tests", ".gitignore"): "seedfile\n",
+}
+
+STEP_DURATIONS = {
+    "cmake": 0.05,
+    "build": 0.2,
+    "test suites": 0.1,
+    "selftest": 0.02,
+}
+
+
+def create_source_tree(path):
+    """Creates a git repository holding a minimal source tree that
+    windows_testing.py can prepare."""
+    for name, content in FAKE_SOURCE_TREE.items():
+        file_path = os.path.join(path, name)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "w") as f:
+            f.write(content)
+    for command in [["init", "-q"], ["add", "."],
+                    ["-c", "user.name=benchmark", "-c",
+                     "user.email=benchmark@example.com",
+                     "commit", "-q", "-m", "Fake source tree"]]:
+        subprocess.run(["git"] + command, cwd=path, check=True)
+
+
+def get_testing_config(cells, step_durations):
+    """Returns the configuration of a matrix of the given number of Visual
+    Studio test runs, rounded up to a multiple of 4."""
+    return {
+        "visual_studio_versions": {"2017": "vcvarsall.bat"},
+        "visual_studio_configurations": [
+            "Configuration{}".format(number)
+            for number in range((cells + 3) // 4)
+        ],
+        "visual_studio_architectures": ["Win32", "x64"],
+        "visual_studio_retarget_solution": [False],
+        "visual_studio_solution_types": ["shipped", "cmake"],
+        "python_command": sys.executable,
+        "toolchain_driver": "fake",
+        "fake_step_durations": step_durations,
+    }
+
+
+def get_simulated_duration(solution_type, step_durations):
+    steps = ["build", "selftest"]
+    if solution_type == "cmake":
+        steps += ["cmake", "test suites"]
+    return sum(step_durations.get(step, 0) for step in steps)
+
+
+def run_benchmark(work_dir, repository, testing_config, jobs, extra_args):
+    """Runs windows_testing.py with the given number of parallel jobs, and
+    returns its wall clock time and the timestamps that it recorded."""
+    log_dir = os.path.join(work_dir, "logs-{}".format(jobs))
+    os.makedirs(log_dir)
+    config_path = os.path.join(work_dir, "config-{}.json".format(jobs))
+    with open(config_path, "w") as f:
+        json.dump(dict(testing_config, parallel_jobs=jobs), f)
+    start = time.monotonic()
+    with open(os.path.join(log_dir, "output.txt"), "w") as output:
+        testing = subprocess.run(
+            [sys.executable, WINDOWS_TESTING, repository, log_dir,
+             "-b", "2017", "-c", config_path] + extra_args,
+            stdout=output,
+            stderr=subprocess.STDOUT
+        )
+    wall_clock = time.monotonic() - start
+    if testing.returncode != 0:
+        print("windows_testing.py returned {} with {} jobs, see {}".format(
+            testing.returncode, jobs, output.name
+        ))
+    with open(os.path.join(log_dir, "timestamps.json")) as f:
+        timestamps = json.load(f)["subtasks"]
+    return wall_clock, timestamps
+
+
+def summarize(jobs, wall_clock, timestamps, step_durations):
+    test_runs = {
+        name: steps for name, steps in timestamps.items()
+        if name.startswith("VS")
+    }
+    simulated = sum(
+        get_simulated_duration(name.split()[-1], step_durations)
+        for name in test_runs
+    )
+    ran = sum(
+        (steps["total"]["innerEnd"] - steps["total"]["innerStart"]) / 1000
+        for steps in test_runs.values()
+    )
+    queued = sum(
+        (steps["total"]["innerStart"] - steps["total"]["start"]) / 1000
+        for steps in test_runs.values()
+    )
+    preparation = sum(
+        (step["end"] - step["start"]) / 1000
+        for step in timestamps.get("Source tree", {}).values()
+    )
+    count = max(1, len(test_runs))
+    return [
+        jobs,
+        len(test_runs),
+        "{:.2f}".format(wall_clock),
+        "{:.2f}".format(simulated / jobs),
+        "{:.1f}".format(len(test_runs) / wall_clock),
+        "{:.3f}".format(preparation),
+        "{:.1f}".format((ran - simulated) / count * 1000),
+        "{:.2f}".format(queued / count),
+    ]
+
+
+def run_main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-n", "--cells", type=int, default=100,
+        help="number of Visual Studio test runs in the matrix (default: 100)"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, nargs="+", default=[1, 2, 4, 8],
+        help="numbers of parallel jobs to benchmark (default: 1 2 4 8)"
+    )
+    parser.add_argument(
+        "-s", "--scale", type=float, default=1.0,
+        help="factor applied to the simulated step durations (default: 1)"
+    )
+    parser.add_argument(
+        "--keep", action="store_true",
+        help="keep the generated source tree and logs"
+    )
+    parser.add_argument(
+        "extra_args", nargs="*",
+        help="arguments passed to windows_testing.py, after --"
+    )
+    args = parser.parse_args()
+    step_durations = {
+        step: duration * args.scale
+        for step, duration in STEP_DURATIONS.items()
+    }
+    testing_config = get_testing_config(args.cells, step_durations)
+    work_dir = tempfile.mkdtemp(prefix="windows-testing-benchmark-")
+    repository = os.path.join(work_dir, "repository")
+    os.makedirs(repository)
+    create_source_tree(repository)
+    result_table = PrettyTable([
+        "Jobs",
+        "Test runs",
+        "Wall clock (s)",
+        "Ideal (s)",
+        "Test runs/s",
+        "Preparation (s)",
+        "Overhead/run (ms)",
+        "Queued/run (s)",
+    ])
+    try:
+        for jobs in args.jobs:
+            wall_clock, timestamps = run_benchmark(
+                work_dir, repository, testing_config, jobs, args.extra_args
+            )
+            result_table.add_row(
+                summarize(jobs, wall_clock, timestamps, step_durations)
+            )
+    finally:
+        if args.keep:
+            print("Logs kept in {}".format(work_dir))
+        else:
+            shutil.rmtree(work_dir)
+    print(result_table)
+
+
+if __name__ == "__main__":
+    run_main()
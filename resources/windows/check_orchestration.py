@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+#  Copyright (c) 2026, Arm Limited, All Rights Reserved
+#  SPDX-License-Identifier: Apache-2.0
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+#  This file is part of Mbed TLS (https://www.trustedfirmware.org/projects/mbed-tls/)
+
+"""
+Checks on Linux how windows_testing.py runs the test runs of its matrix:
+parallel: with the fake toolchain driver, as many test runs as
+parallel_jobs run at the same time, and never more;
+timeout: with the fake toolchain driver, the test runs that take longer
+than job_timeout are recorded as timed out, and the run fails;
+kill: with the Windows toolchain driver running stub commands under
+/bin/sh, a build that started a background process is killed with that
+process once job_timeout is reached.
+Exits with 1 if a check fails. Requires prettytable package.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark_orchestration import (WINDOWS_TESTING, create_source_tree,
+                                     get_testing_config)
+
+# A build that starts a background process, writes its pid and waits
+STUB_MSBUILD = """#!/bin/sh
+sleep 60 &
+echo $! > "{pid_file}"
+echo "Building"
+sleep 60
+echo "Build succeeded."
+"""
+
+
+class CheckFailed(Exception):
+    pass
+
+
+def run_windows_testing(work_dir, repository, name, testing_config,
+                        time_limit):
+    """Runs windows_testing.py on a Visual Studio 2017 matrix and returns
+    its exit code, its wall clock time and the steps of each Visual Studio
+    test run."""
+    log_dir = os.path.join(work_dir, "logs-" + name)
+    os.makedirs(log_dir)
+    config_path = os.path.join(work_dir, "config-{}.json".format(name))
+    with open(config_path, "w") as f:
+        json.dump(testing_config, f)
+    start = time.monotonic()
+    with open(os.path.join(log_dir, "output.txt"), "w") as output:
+        testing = subprocess.run(
+            [sys.executable, WINDOWS_TESTING, repository, log_dir,
+             "-b", "2017", "-c", config_path],
+            stdout=output,
+            stderr=subprocess.STDOUT,
+            timeout=time_limit
+        )
+    wall_clock = time.monotonic() - start
+    with open(os.path.join(log_dir, "timestamps.json")) as f:
+        timestamps = json.load(f)["subtasks"]
+    test_runs = {
+        name: steps for name, steps in timestamps.items()
+        if name.startswith("VS")
+    }
+    return testing.returncode, wall_clock, test_runs
+
+
+def get_max_overlap(test_runs):
+    """Returns the largest number of test runs that ran at the same time."""
+    events = []
+    for steps in test_runs.values():
+        events.append((steps["total"]["innerStart"], 1))
+        events.append((steps["total"]["innerEnd"], -1))
+    running = max_running = 0
+    # At equal times, a test run ending makes room for one starting
+    for _, change in sorted(events):
+        running += change
+        max_running = max(max_running, running)
+    return max_running
+
+
+def check_parallel(work_dir, repository):
+    jobs = 4
+    testing_config = dict(
+        get_testing_config(8, {"build": 0.5}), parallel_jobs=jobs
+    )
+    return_code, wall_clock, test_runs = run_windows_testing(
+        work_dir, repository, "parallel", testing_config, 60
+    )
+    if return_code != 0:
+        raise CheckFailed("windows_testing.py returned {}".format(
+            return_code
+        ))
+    overlap = get_max_overlap(test_runs)
+    if overlap != jobs:
+        raise CheckFailed("{} test runs ran at the same time, expected "
+                          "{}".format(overlap, jobs))
+    return "{} test runs, {} at a time, in {:.2f}s".format(
+        len(test_runs), overlap, wall_clock
+    )
+
+
+def check_timeout(work_dir, repository):
+    testing_config = dict(
+        get_testing_config(4, {"build": 5}),
+        parallel_jobs=4, job_timeout=0.5
+    )
+    return_code, wall_clock, test_runs = run_windows_testing(
+        work_dir, repository, "timeout", testing_config, 60
+    )
+    if return_code == 0:
+        raise CheckFailed("windows_testing.py succeeded")
+    not_timed_out = [
+        name for name, steps in test_runs.items()
+        if not any(step.get("timedOut") for step in steps.values())
+    ]
+    if not test_runs or not_timed_out:
+        raise CheckFailed("test runs not timed out: {}".format(
+            ", ".join(not_timed_out) or "no test run"
+        ))
+    if wall_clock > 5:
+        raise CheckFailed("took {:.2f}s, longer than a build".format(
+            wall_clock
+        ))
+    return "{} test runs timed out in {:.2f}s".format(
+        len(test_runs), wall_clock
+    )
+
+
+def is_running(pid):
+    try:
+        with open("/proc/{}/stat".format(pid)) as f:
+            # A zombie waits to be reaped, but no longer runs
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def check_kill(work_dir, repository):
+    stub_dir = os.path.join(work_dir, "stubs")
+    os.makedirs(stub_dir)
+    pid_file = os.path.join(work_dir, "background.pid")
+    stubs = {
+        "vcvarsall": "#!/bin/sh\n",
+        "msbuild": STUB_MSBUILD.format(pid_file=pid_file),
+    }
+    for name, content in stubs.items():
+        path = os.path.join(stub_dir, name)
+        with open(path, "w") as f:
+            f.write(content)
+        os.chmod(path, 0o755)
+    testing_config = dict(
+        get_testing_config(1, {}),
+        visual_studio_versions={
+            "2017": os.path.join(stub_dir, "vcvarsall")
+        },
+        visual_studio_configurations=["Release"],
+        visual_studio_architectures=["x64"],
+        visual_studio_solution_types=["shipped"],
+        toolchain_driver="windows",
+        cmd_command="/bin/sh",
+        msbuild_command=os.path.join(stub_dir, "msbuild"),
+        job_timeout=2
+    )
+    return_code, wall_clock, test_runs = run_windows_testing(
+        work_dir, repository, "kill", testing_config, 50
+    )
+    if return_code == 0:
+        raise CheckFailed("windows_testing.py succeeded")
+    if not any(step.get("timedOut") for steps in test_runs.values()
+               for step in steps.values()):
+        raise CheckFailed("the build was not recorded as timed out")
+    if not os.path.exists(pid_file):
+        raise CheckFailed("the stub build did not start")
+    with open(pid_file) as f:
+        pid = int(f.read())
+    deadline = time.monotonic() + 5
+    while is_running(pid) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    if is_running(pid):
+        raise CheckFailed("background process {} still running".format(pid))
+    if wall_clock > 20:
+        raise CheckFailed("took {:.2f}s, the build was not killed".format(
+            wall_clock
+        ))
+    return "build and background process killed in {:.2f}s".format(
+        wall_clock
+    )
+
+
+CHECKS = {
+    "parallel": check_parallel,
+    "timeout": check_timeout,
+    "kill": check_kill,
+}
+
+
+def run_main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "checks", nargs="*", metavar="CHECK",
+        help="checks to run among {} (default: all)".format(
+            ", ".join(sorted(CHECKS))
+        )
+    )
+    parser.add_argument(
+        "--keep", action="store_true",
+        help="keep the generated source tree and logs"
+    )
+    args = parser.parse_args()
+    for name in args.checks:
+        if name not in CHECKS:
+            parser.error("unknown check '{}'".format(name))
+    work_dir = tempfile.mkdtemp(prefix="windows-testing-check-")
+    repository = os.path.join(work_dir, "repository")
+    os.makedirs(repository)
+    create_source_tree(repository)
+    failed = False
+    try:
+        for name in args.checks or sorted(CHECKS):
+            try:
+                print("{}: {}".format(name, CHECKS[name](work_dir,
+                                                         repository)))
+            except (CheckFailed, subprocess.TimeoutExpired) as e:
+                print("{}: FAILED: {}".format(name, e))
+                failed = True
+    finally:
+        if args.keep or failed:
+            print("Logs kept in {}".format(work_dir))
+        else:
+            shutil.rmtree(work_dir)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    run_main()
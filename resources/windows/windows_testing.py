@@ -24,22 +24,48 @@ configurations of Visual Studio, as well as MinGW32. Returns 0 on success,
 Requires prettytable package.
 """
 
-from collections import OrderedDict
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from prettytable import PrettyTable
 
 import argparse
+import filecmp
+import fnmatch
+import hashlib
 import json
 import logging
 import os
+import queue
 import re
+import signal
 import subprocess
 import tempfile
 import shutil
 import sys
+import threading
+import time
 import traceback
 import glob
 
 
+# Runs config.py once for each command given as a JSON list, in a single
+# Python interpreter, so that the commands cost one interpreter startup.
+CONFIG_BATCH_SCRIPT = """
+import json, runpy, sys
+config_py = sys.argv[1]
+for command in json.loads(sys.argv[2]):
+    sys.argv = [config_py] + command
+    print(" ".join(sys.argv))
+    sys.stdout.flush()
+    try:
+        runpy.run_path(config_py, run_name="__main__")
+    except SystemExit as exit:
+        if exit.code:
+            raise
+"""
+
+
 class VStestrun(object):
 
     def __init__(self, vs_version, configuration, architecture, retargeted):
@@ -55,6 +81,169 @@ class VStestrun(object):
             ("cmake selftest", "Not Run"),
             ("cmake test suites", "Not Run"),
         ])
+        # Result and duration in seconds of each test suite run by ctest
+        self.test_suites = OrderedDict()
+
+
+class WindowsToolchainDriver(object):
+    """Runs the build and test steps of the test runs with the Windows
+    toolchains: cmake, msbuild and ctest from the Visual Studio command
+    prompt, selftest.exe, and MinGW make."""
+
+    def __init__(self, testing):
+        self.testing = testing
+
+    def get_vcvars_script(self, test_run):
+        return "\"{}\" {}\n".format(
+            self.testing.visual_studio_vcvars_path[test_run.vs_version],
+            self.testing.visual_studio_architecture_flags[
+                test_run.architecture]
+        )
+
+    def generate_cmake_solution(self, solution_dir, test_run, logger):
+        self.testing.run_logged(
+            [self.testing.cmake_command, "-D", "ENABLE_TESTING=ON", "-G",
+             "{}{}".format(
+                 self.testing.cmake_generators[test_run.vs_version],
+                 self.testing.cmake_architecture_flags[test_run.architecture]),
+             ".."], logger,
+            cwd=solution_dir,
+            check=True
+        )
+
+    def build_solution(self, solution_dir, solution_file, test_run,
+                       platform_toolset, target, environment, logger,
+                       patterns):
+        msbuild_script = self.get_vcvars_script(test_run)
+        msbuild_script += (
+            "{} /nodeReuse:false /t:{} /p:Configuration={},Platform={},"
+            "PlatformToolset={} /m \"{}\"\n".format(
+                self.testing.msbuild_command, target,
+                test_run.configuration, test_run.architecture,
+                platform_toolset, solution_file
+            )
+        )
+        return self.testing.run_logged(
+            [self.testing.cmd_command], logger,
+            patterns=patterns,
+            script=msbuild_script,
+            env=environment,
+            cwd=solution_dir
+        )
+
+    def run_test_suites(self, solution_dir, test_run, environment, logger,
+                        patterns, line_handler):
+        ctest_script = self.get_vcvars_script(test_run)
+        ctest_script += "{} -C {} -j {}\n".format(
+            self.testing.ctest_command, test_run.configuration,
+            self.testing.ctest_jobs
+        )
+        return self.testing.run_logged(
+            [self.testing.cmd_command], logger,
+            patterns=patterns,
+            script=ctest_script,
+            line_handler=line_handler,
+            env=environment,
+            cwd=solution_dir
+        )
+
+    def run_selftest(self, selftest_dir, logger, patterns):
+        return self.testing.run_logged(
+            [os.path.join(selftest_dir, self.testing.selftest_exe)], logger,
+            patterns=patterns,
+            script="\n",
+            cwd=selftest_dir,
+            check=True
+        )
+
+    def run_make(self, arguments, environment, cwd, logger, patterns=()):
+        return self.testing.run_logged(
+            [self.testing.mingw_command] + arguments, logger,
+            patterns=patterns,
+            env=environment,
+            cwd=cwd,
+            check=True
+        )
+
+
+class FakeToolchainDriver(object):
+    """Simulates the build and test steps of the test runs, so that the
+    orchestration can be tested and benchmarked on any platform. Each step
+    waits for its configured duration in seconds, then logs the output of
+    a successful run of the real tools. The builds of the test runs whose
+    log name contains one of failing_test_runs fail."""
+
+    def __init__(self, testing, step_durations, failing_test_runs):
+        self.testing = testing
+        self.step_durations = step_durations
+        self.failing_test_runs = failing_test_runs
+        self.test_suites = ["aes.ecb", "md", "rsa", "ssl", "x509parse"]
+
+    def simulate(self, step, lines, logger, patterns, line_handler=None):
+        duration = self.step_durations.get(step, 0)
+        timeout = self.testing.get_timeout()
+        if timeout is not None and duration > timeout:
+            time.sleep(timeout)
+            raise subprocess.TimeoutExpired(step, timeout)
+        time.sleep(duration)
+        matched = set()
+        for line in lines:
+            logger.info(line)
+            if line_handler is not None:
+                line_handler(line)
+            matched.update(x for x in patterns if re.search(x, line))
+        return 0, matched
+
+    def generate_cmake_solution(self, solution_dir, test_run, logger):
+        self.simulate("cmake", ["-- Generating done"], logger, [])
+        open(os.path.join(solution_dir, "mbed TLS.sln"), "w").close()
+
+    def build_solution(self, solution_dir, solution_file, test_run,
+                       platform_toolset, target, environment, logger,
+                       patterns):
+        if any(name in logger.name for name in self.failing_test_runs):
+            self.simulate("build", ["Build FAILED."], logger, patterns)
+            return 1, set()
+        return self.simulate(
+            "build",
+            ["Build succeeded.", "    0 Warning(s)", "    0 Error(s)"],
+            logger, patterns
+        )
+
+    def run_test_suites(self, solution_dir, test_run, environment, logger,
+                        patterns, line_handler):
+        lines = []
+        duration = self.step_durations.get("test suites", 0)
+        count = len(self.test_suites)
+        with open(environment["MBEDTLS_TEST_OUTCOME_FILE"], "a") as f:
+            for number, suite in enumerate(self.test_suites, 1):
+                lines.append(
+                    "{}/{} Test #{}: {}-suite ....   Passed {:.2f} sec".format(
+                        number, count, number, suite, duration / count
+                    )
+                )
+                f.write("{};{};test_suite_{};Fake test case;PASS;\n".format(
+                    environment["MBEDTLS_TEST_PLATFORM"],
+                    environment["MBEDTLS_TEST_CONFIGURATION"], suite
+                ))
+        lines.append(
+            "100% tests passed, 0 tests failed out of {}".format(count)
+        )
+        return self.simulate("test suites", lines, logger, patterns,
+                             line_handler)
+
+    def run_selftest(self, selftest_dir, logger, patterns):
+        return self.simulate("selftest", ["  [ All tests PASS ]"],
+                             logger, patterns)
+
+    def run_make(self, arguments, environment, cwd, logger, patterns=()):
+        lines = []
+        if "check" in arguments:
+            lines.append("PASSED ({} suites, {} tests run)".format(
+                len(self.test_suites), len(self.test_suites)
+            ))
+        return self.simulate("make " + arguments[-1], lines, logger,
+                             patterns)
 
 
 class MbedWindowsTesting(object):
@@ -68,6 +257,15 @@ class MbedWindowsTesting(object):
         self.repository_path = repository_path
         self.log_dir = logging_directory
         self.return_code = 0
+        self.return_code_lock = threading.Lock()
+        # git does not support concurrent worktree operations on a repository
+        self.git_lock = threading.Lock()
+        # Holds the deadline of the test run executing on each thread
+        self.job_state = threading.local()
+        # Start and end times of the steps of each test run, in milliseconds
+        # since the epoch, keyed by test run and step name
+        self.timestamps = OrderedDict()
+        self.timestamps_lock = threading.Lock()
         if "config_to_disable" in testing_config.keys():
             self.config_to_disable = testing_config["config_to_disable"]
         else:
@@ -131,6 +329,77 @@ class MbedWindowsTesting(object):
             self.visual_studio_retarget_solution = testing_config["visual_studio_retarget_solution"]
         else:
             self.visual_studio_retarget_solution = [False, True]
+        if "parallel_jobs" in testing_config.keys():
+            self.parallel_jobs = testing_config["parallel_jobs"]
+        else:
+            self.parallel_jobs = 1
+        # Maximum duration of each test run in seconds, None for no limit
+        if "job_timeout" in testing_config.keys():
+            self.job_timeout = testing_config["job_timeout"]
+        else:
+            self.job_timeout = None
+        # Run one test run per Visual Studio version first, and only run
+        # the others if it builds
+        if "canary_test_runs" in testing_config.keys():
+            self.canary_test_runs = testing_config["canary_test_runs"]
+        else:
+            self.canary_test_runs = False
+        # Stop starting new test runs once one has failed
+        if "fail_fast" in testing_config.keys():
+            self.fail_fast = testing_config["fail_fast"]
+        else:
+            self.fail_fast = False
+        # How many jobs make runs concurrently in the MinGW test run
+        if "mingw_jobs" in testing_config.keys():
+            self.mingw_jobs = testing_config["mingw_jobs"]
+        else:
+            self.mingw_jobs = os.cpu_count() or 1
+        # Build the MinGW code and run its tests as two separate steps
+        if "mingw_split_check" in testing_config.keys():
+            self.mingw_split_check = testing_config["mingw_split_check"]
+        else:
+            self.mingw_split_check = False
+        # How many test suites ctest runs concurrently in each test run
+        if "ctest_jobs" in testing_config.keys():
+            self.ctest_jobs = testing_config["ctest_jobs"]
+        else:
+            self.ctest_jobs = max(
+                1, (os.cpu_count() or 1) // self.parallel_jobs
+            )
+        # How the prepared source tree is cloned for each test run: "copy"
+        # (as a copy-on-write clone where the file system supports it, which
+        # is only done on Linux: on Windows every file is copied), or
+        # "hardlink" to hard-link the files matching one of the glob
+        # patterns of source_tree_read_only_paths, relative to the root of
+        # the tree, and copy the others. Hard-linked files are shared by all
+        # clones, so they must never be rewritten by a build.
+        if "source_tree_clone_method" in testing_config.keys():
+            self.source_tree_clone_method = testing_config[
+                "source_tree_clone_method"]
+        else:
+            self.source_tree_clone_method = "copy"
+        self.source_tree_read_only_paths = testing_config.get(
+            "source_tree_read_only_paths", []
+        )
+        # The configured source tree shared by all test runs, and the clone
+        # of it taken for MinGW before the Visual Studio source generation
+        self.prepared_tree_path = None
+        self.mingw_tree_path = None
+        # Optional directory where configured headers are kept between runs
+        if "config_cache_directory" in testing_config.keys():
+            self.config_cache_directory = testing_config[
+                "config_cache_directory"]
+        else:
+            self.config_cache_directory = None
+        self.config_cache = {}
+        self.source_tree_key = None
+        # Optional directory holding a persistent build directory per
+        # Visual Studio test run, for incremental builds
+        if "incremental_build_directory" in testing_config.keys():
+            self.incremental_build_directory = testing_config[
+                "incremental_build_directory"]
+        else:
+            self.incremental_build_directory = None
 
         self.vs_version_toolsets = {
             "2010": "100",
@@ -147,6 +416,8 @@ class MbedWindowsTesting(object):
             "2017": "Visual Studio 15 2017"
         }
         self.vs_test_runs = []
+        # Test runs that were not started, and why
+        self.skipped_test_runs = []
         self.build_mingw = "mingw" in build_method
         self.vs_versions_to_build = list(
             set(build_method) & set(self.visual_studio_versions)
@@ -162,12 +433,52 @@ class MbedWindowsTesting(object):
         self.visual_studio_build_zero_warnings_string = "0 Warning(s)"
         self.selftest_success_pattern = "\[ All tests (PASS|passed) \]"
         self.test_suites_success_pattern = "100% tests passed, 0 tests failed"
+        self.ctest_result_pattern = re.compile(
+            r"\d+/\d+ Test +#\d+: (\S+) \.*(?:\*+)?\s*(.*?)\s+"
+            r"([\d.]+) sec\s*\Z"
+        )
+        # ctest results of test suites that were disabled or skipped
+        # themselves, recorded as skipped as on Linux. A bare "Not Run"
+        # means that the test executable is missing, which is a failure.
+        self.ctest_skip_result_pattern = re.compile(
+            r"(?:Not Run \(Disabled\)|Skipped)\Z"
+        )
+        # Number of slowest test suites listed in the log of each test run
+        self.slowest_test_suites_count = 10
         self.mingw_success_pattern = "PASSED \(\d+ suites, \d+ tests run\)"
+        # Number of output lines kept to report a failed command
+        self.output_tail_lines = 50
         self.config_py_location = os.path.join("scripts", "config.py")
+        # The files that config.py may modify, across all supported branches
+        self.config_header_patterns = [
+            os.path.join("include", "mbedtls", "*config.h"),
+            os.path.join("include", "psa", "crypto_config.h"),
+            os.path.join("tf-psa-crypto", "include", "psa", "crypto_config.h"),
+        ]
         self.selftest_exe = "selftest.exe"
         self.mingw_command = "mingw32-make"
         self.git_command = "git"
         self.python_command = "python"
+        self.cmd_command = "cmd.exe"
+        self.cmake_command = "cmake"
+        self.msbuild_command = "msbuild"
+        self.ctest_command = "ctest"
+        # The commands can be overridden, e.g. by stubs to test the script
+        for command in ["mingw", "git", "python", "cmd", "cmake", "msbuild",
+                        "ctest"]:
+            if command + "_command" in testing_config.keys():
+                setattr(self, command + "_command",
+                        testing_config[command + "_command"])
+        # "windows" runs the real toolchains, "fake" simulates them with
+        # the given durations of each step, in seconds
+        if testing_config.get("toolchain_driver", "windows") == "fake":
+            self.driver = FakeToolchainDriver(
+                self,
+                testing_config.get("fake_step_durations", {}),
+                testing_config.get("fake_failing_test_runs", [])
+            )
+        else:
+            self.driver = WindowsToolchainDriver(self)
 
     def this_version_forbids_c99(self, path):
         # If CMakeLists.txt contains -Wdeclaration-after-statement,
@@ -180,8 +491,175 @@ class MbedWindowsTesting(object):
             return '-Wdeclaration-after-statement' in content
 
     def set_return_code(self, return_code):
-        if return_code > self.return_code:
-            self.return_code = return_code
+        with self.return_code_lock:
+            if return_code > self.return_code:
+                self.return_code = return_code
+
+    def get_timeout(self):
+        """Returns the number of seconds left before the test run on the
+        current thread times out, or None if it has no time limit."""
+        deadline = getattr(self.job_state, "deadline", None)
+        if deadline is None:
+            return None
+        return max(0, deadline - time.monotonic())
+
+    def run_logged(self, args, logger, patterns=(), script=None,
+                   check=False, line_handler=None, **kwargs):
+        """Runs args, logging its output line by line as it is produced.
+        If script is given, it is fed to the standard input of the process.
+        Returns the exit code of the process and the set of patterns that
+        matched at least one line of output. The process is killed if the
+        time limit of the current test run is reached.
+        If check is set, a non-zero exit code raises CalledProcessError,
+        holding the last lines of output. If line_handler is given, it is
+        called with each line of output.
+        The output is read by a separate thread, so that on timeout the
+        process tree is killed and its output abandoned even if a process
+        that escaped the kill still holds the pipe open."""
+        if os.name != "nt":
+            # Put the process in its own process group, to kill the
+            # processes that it starts with it
+            kwargs.setdefault("start_new_session", True)
+        process = subprocess.Popen(
+            args,
+            encoding=sys.stdout.encoding,
+            stdin=subprocess.PIPE if script is not None else None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            **kwargs
+        )
+        lines = queue.Queue()
+        def read_output():
+            for line in process.stdout:
+                lines.put(line)
+            lines.put(None)
+        reader = threading.Thread(target=read_output, daemon=True)
+        reader.start()
+        timed_out = threading.Event()
+        def kill():
+            timed_out.set()
+            self.kill_process_tree(process)
+            # Stop reading, whether or not the pipe gets closed
+            lines.put(None)
+        timeout = self.get_timeout()
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, kill)
+            timer.start()
+        unmatched = list(patterns)
+        matched = set()
+        last_lines = deque(maxlen=self.output_tail_lines)
+        try:
+            if script is not None:
+                try:
+                    process.stdin.write(script)
+                    process.stdin.close()
+                except BrokenPipeError:
+                    # The process exited without reading all of its input
+                    pass
+            for line in iter(lines.get, None):
+                line = line.rstrip("\r\n")
+                logger.info(line)
+                last_lines.append(line)
+                if line_handler is not None:
+                    line_handler(line)
+                for pattern in unmatched:
+                    if re.search(pattern, line):
+                        matched.add(pattern)
+                unmatched = [x for x in unmatched if x not in matched]
+            return_code = process.wait()
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if process.poll() is None:
+                self.kill_process_tree(process)
+                process.wait()
+        if timed_out.is_set():
+            logger.error("Killed after the time limit of the test run")
+            raise subprocess.TimeoutExpired(args, timeout)
+        if check and return_code != 0:
+            raise subprocess.CalledProcessError(
+                return_code, args, output="\n".join(last_lines)
+            )
+        return return_code, matched
+
+    @staticmethod
+    def kill_process_tree(process):
+        """Kills a process started by run_logged and all the processes that
+        it started, such as msbuild and ctest under cmd."""
+        if os.name == "nt":
+            subprocess.run(
+                ["taskkill", "/T", "/F", "/PID", str(process.pid)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+        else:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        # taskkill fails if the process has already exited
+        try:
+            process.kill()
+        except OSError:
+            pass
+
+    def get_time_ms(self):
+        return int(time.time() * 1000)
+
+    def start_step(self, logger, step, queued_at=None):
+        """Records the start of a step of the test run that logs to logger,
+        in the format of the timestamps recorded by the Jenkins jobs, with -1
+        for unset times. If queued_at is given, the step started then and
+        only ran from now on."""
+        now = self.get_time_ms()
+        timestamps = {
+            "start": now if queued_at is None else queued_at,
+            "end": -1,
+            "innerStart": -1 if queued_at is None else now,
+            "innerEnd": -1,
+        }
+        with self.timestamps_lock:
+            self.timestamps.setdefault(
+                logger.name, OrderedDict()
+            )[step] = timestamps
+        return timestamps
+
+    def end_step(self, timestamps):
+        timestamps["end"] = self.get_time_ms()
+        if timestamps["innerStart"] != -1:
+            timestamps["innerEnd"] = timestamps["end"]
+
+    @contextmanager
+    def record_step(self, logger, step):
+        timestamps = self.start_step(logger, step)
+        try:
+            yield
+        except subprocess.TimeoutExpired:
+            timestamps["timedOut"] = True
+            raise
+        finally:
+            self.end_step(timestamps)
+
+    def write_test_run_results(self, log_name, results, test_suites=None):
+        """Writes the results and step timestamps of a test run to a JSON
+        file next to its log, with the result and duration of each test
+        suite if any ran."""
+        with self.timestamps_lock:
+            steps = dict(self.timestamps.get(log_name, {}))
+        test_run_results = {
+            "version": 1,
+            "name": log_name,
+            "results": results,
+            "subtasks": {log_name: steps},
+        }
+        if test_suites:
+            test_run_results["test suites"] = OrderedDict(
+                (suite, {"result": result, "duration": duration})
+                for suite, (result, duration) in test_suites.items()
+            )
+        with open(os.path.join(self.log_dir, log_name + ".json"), "w") as f:
+            json.dump(test_run_results, f, indent=2)
 
     def setup_logger(self, name, log_file, level=logging.INFO):
         """Creates a logger that outputs both to console and to log_file"""
@@ -203,26 +681,27 @@ class MbedWindowsTesting(object):
         logger.info("Checking out git worktree")
         git_worktree_path = os.path.abspath(tempfile.mkdtemp())
         try:
-            worktree_output = subprocess.run(
-                [self.git_command, "worktree", "add", "--detach",
-                 git_worktree_path, "HEAD"],
-                cwd=self.repository_path,
-                encoding=sys.stdout.encoding,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                check=True
-            )
-            logger.info(worktree_output.stdout)
-            submodule_output = subprocess.run(
-                [self.git_command, "submodule", "foreach", "--recursive",
-                 'git worktree add --detach "{}/$displaypath" HEAD'.format(git_worktree_path)],
-                cwd=self.repository_path,
-                encoding=sys.stdout.encoding,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                check=True
-            )
-            logger.info(submodule_output.stdout)
+            with self.git_lock:
+                worktree_output = subprocess.run(
+                    [self.git_command, "worktree", "add", "--detach",
+                     git_worktree_path, "HEAD"],
+                    cwd=self.repository_path,
+                    encoding=sys.stdout.encoding,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    check=True
+                )
+                logger.info(worktree_output.stdout)
+                submodule_output = subprocess.run(
+                    [self.git_command, "submodule", "foreach", "--recursive",
+                     'git worktree add --detach "{}/$displaypath" HEAD'.format(git_worktree_path)],
+                    cwd=self.repository_path,
+                    encoding=sys.stdout.encoding,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    check=True
+                )
+                logger.info(submodule_output.stdout)
             return git_worktree_path
         except subprocess.CalledProcessError as error:
             self.set_return_code(2)
@@ -232,60 +711,139 @@ class MbedWindowsTesting(object):
     def cleanup_git_worktree(self, git_worktree_path, logger):
         shutil.rmtree(git_worktree_path)
         try:
-            worktree_output = subprocess.run(
-                [self.git_command, "worktree", "prune"],
+            with self.git_lock:
+                worktree_output = subprocess.run(
+                    [self.git_command, "worktree", "prune"],
+                    cwd=self.repository_path,
+                    encoding=sys.stdout.encoding,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    check=True
+                )
+                logger.info(worktree_output.stdout)
+                submodule_output = subprocess.run(
+                    [self.git_command, "submodule", "foreach", "--recursive", "git worktree prune"],
+                    cwd=self.repository_path,
+                    encoding=sys.stdout.encoding,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    check=True
+                )
+                logger.info(submodule_output.stdout)
+        except subprocess.CalledProcessError as error:
+            self.set_return_code(2)
+            logger.error(error.output)
+            raise Exception("Worktree cleanup failed, aborting")
+
+    def get_config_commands(self):
+        return [["full"]] + [
+            ["unset", option] for option in self.config_to_disable
+        ]
+
+    def get_source_tree_key(self):
+        """Identifies the prepared source tree. It only depends on the
+        committed source trees of the repository and its submodules, which
+        the worktree is checked out from, and on the config.py commands.
+        Returns None if the key cannot be determined."""
+        if self.source_tree_key is not None:
+            return self.source_tree_key
+        try:
+            tree_ids = subprocess.run(
+                [self.git_command, "rev-parse", "HEAD^{tree}"],
                 cwd=self.repository_path,
                 encoding=sys.stdout.encoding,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
                 check=True
-            )
-            logger.info(worktree_output.stdout)
-            submodule_output = subprocess.run(
-                [self.git_command, "submodule", "foreach", "--recursive", "git worktree prune"],
+            ).stdout
+            tree_ids += subprocess.run(
+                [self.git_command, "submodule", "foreach", "--recursive",
+                 "git rev-parse HEAD^{tree}"],
                 cwd=self.repository_path,
                 encoding=sys.stdout.encoding,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
                 check=True
-            )
-            logger.info(submodule_output.stdout)
-        except subprocess.CalledProcessError as error:
-            self.set_return_code(2)
-            logger.error(error.output)
-            raise Exception("Worktree cleanup failed, aborting")
+            ).stdout
+        except subprocess.CalledProcessError:
+            return None
+        key = hashlib.sha256(tree_ids.encode("utf-8"))
+        key.update(json.dumps(self.get_config_commands()).encode("utf-8"))
+        self.source_tree_key = key.hexdigest()
+        return self.source_tree_key
+
+    def read_config_headers(self, git_worktree_path):
+        headers = {}
+        for pattern in self.config_header_patterns:
+            for header in glob.glob(os.path.join(git_worktree_path, pattern)):
+                with open(header, encoding="utf-8", newline="") as f:
+                    headers[os.path.relpath(header, git_worktree_path)] = \
+                        f.read()
+        return headers
+
+    def load_cached_config(self, cache_key):
+        if cache_key in self.config_cache:
+            return self.config_cache[cache_key]
+        if self.config_cache_directory is None:
+            return None
+        cache_file = os.path.join(self.config_cache_directory,
+                                  cache_key + ".json")
+        if not os.path.isfile(cache_file):
+            return None
+        with open(cache_file, encoding="utf-8") as f:
+            self.config_cache[cache_key] = json.load(f)
+        return self.config_cache[cache_key]
+
+    def store_cached_config(self, cache_key, headers):
+        self.config_cache[cache_key] = headers
+        if self.config_cache_directory is None:
+            return
+        os.makedirs(self.config_cache_directory, exist_ok=True)
+        cache_file = os.path.join(self.config_cache_directory,
+                                  cache_key + ".json")
+        with open(cache_file + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(headers, f)
+        os.replace(cache_file + ".tmp", cache_file)
 
     def set_config_on_code(self, git_worktree_path, logger):
-        """Enables all config specified in config.pl, then disables config
-         based on the version being tested."""
+        """Enables all config specified in config.py, then disables config
+         based on the version being tested. All the config.py commands run
+         in a single interpreter, and the resulting headers are cached."""
+        config_commands = self.get_config_commands()
+        cache_key = self.get_source_tree_key()
+        cached_headers = None
+        if cache_key is not None:
+            cached_headers = self.load_cached_config(cache_key)
+        if cached_headers is not None:
+            logger.info("Using cached configuration {}".format(cache_key))
+            for header, content in cached_headers.items():
+                with open(os.path.join(git_worktree_path, header), "w",
+                          encoding="utf-8", newline="") as f:
+                    f.write(content)
+            return
         logger.info("Enabling as much of {} as possible".format(
                 self.config_py_location
         ))
+        original_headers = self.read_config_headers(git_worktree_path)
         try:
-            enable_output = subprocess.run(
-                [self.python_command, self.config_py_location, "full"],
+            self.run_logged(
+                [self.python_command, "-c", CONFIG_BATCH_SCRIPT,
+                 self.config_py_location, json.dumps(config_commands)],
+                logger,
                 cwd=git_worktree_path,
-                encoding=sys.stdout.encoding,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
                 check=True
             )
-            logger.info(enable_output.stdout)
-            for option in self.config_to_disable:
-                disable_output = subprocess.run(
-                    [self.python_command, self.config_py_location,
-                     "unset", option],
-                    cwd=git_worktree_path,
-                    encoding=sys.stdout.encoding,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    check=True
-                )
-                logger.info(disable_output.stdout)
         except subprocess.CalledProcessError as error:
             self.set_return_code(2)
             logger.error(error.output)
             raise Exception("Setting config failed, aborting")
+        if cache_key is not None:
+            configured_headers = self.read_config_headers(git_worktree_path)
+            self.store_cached_config(cache_key, {
+                header: content
+                for header, content in configured_headers.items()
+                if original_headers.get(header) != content
+            })
 
     def generate_seedfile(self, filename):
         """This tests if a file exists, and if not, creates it with 64 bytes
@@ -306,23 +864,179 @@ class MbedWindowsTesting(object):
                 "tf-psa-crypto/tests/seedfile")
             self.generate_seedfile(crypto_seed_filename)
 
+    @staticmethod
+    def copy_file(source, destination):
+        """Copies a file, as a copy-on-write clone if the file system
+        supports it. Only FICLONE on Linux (Btrfs, XFS) is used: on Windows,
+        ReFS block cloning is not implemented and the file is fully
+        copied."""
+        try:
+            import fcntl
+            with open(source, "rb") as source_file, \
+                    open(destination, "wb") as destination_file:
+                # FICLONE
+                fcntl.ioctl(destination_file.fileno(), 0x40049409,
+                            source_file.fileno())
+            shutil.copystat(source, destination)
+        except (ImportError, OSError):
+            shutil.copy2(source, destination)
+        return destination
+
+    def link_or_copy_file(self, source, destination):
+        """Hard-links the files declared read-only, copies the others."""
+        relative_path = os.path.relpath(
+            source, self.prepared_tree_path
+        ).replace(os.sep, "/")
+        if any(fnmatch.fnmatch(relative_path, pattern)
+               for pattern in self.source_tree_read_only_paths):
+            try:
+                os.link(source, destination)
+                return destination
+            except OSError:
+                pass
+        return self.copy_file(source, destination)
+
+    def clone_prepared_tree(self, logger, allow_links=True):
+        """Makes a private copy of the prepared source tree for a test run,
+        which takes seconds rather than the minutes needed to check out and
+        configure a new worktree. Files are copied, unless the clone method
+        is "hardlink" and allow_links is set, in which case the files
+        declared read-only are hard-linked."""
+        clone_path = os.path.abspath(tempfile.mkdtemp())
+        logger.info("Cloning prepared source tree into {}".format(clone_path))
+        if self.source_tree_clone_method == "hardlink" and allow_links:
+            copy_function = self.link_or_copy_file
+        else:
+            copy_function = self.copy_file
+        shutil.copytree(
+            self.prepared_tree_path, clone_path, symlinks=True,
+            ignore=shutil.ignore_patterns(".git"),
+            copy_function=copy_function, dirs_exist_ok=True
+        )
+        return clone_path
+
+    def remove_tree_clone(self, clone_path):
+        shutil.rmtree(clone_path)
+
+    def sync_source_tree(self, destination, logger):
+        """Makes destination hold the same source files as the prepared
+        source tree. Only files whose content changed are rewritten, so that
+        their timestamps drive an incremental build. Files copied by an
+        earlier sync that are no longer in the source tree are removed,
+        build outputs are kept."""
+        manifest_path = os.path.join(destination, ".source_files.json")
+        previous_files = set()
+        if os.path.isfile(manifest_path):
+            with open(manifest_path) as f:
+                previous_files = set(json.load(f))
+        source_files = []
+        updated = 0
+        for root, dirs, files in os.walk(self.prepared_tree_path):
+            dirs[:] = [d for d in dirs if d != ".git"]
+            for name in files:
+                if name == ".git":
+                    continue
+                source = os.path.join(root, name)
+                relative_path = os.path.relpath(source,
+                                                self.prepared_tree_path)
+                source_files.append(relative_path)
+                target = os.path.join(destination, relative_path)
+                if (not os.path.isfile(target) or
+                        not filecmp.cmp(source, target, shallow=False)):
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.copyfile(source, target)
+                    updated += 1
+        removed = previous_files.difference(source_files)
+        for relative_path in removed:
+            target = os.path.join(destination, relative_path)
+            if os.path.isfile(target):
+                os.remove(target)
+        with open(manifest_path, "w") as f:
+            json.dump(source_files, f)
+        logger.info("Synchronized {}: {} files updated, {} removed".format(
+            destination, updated, len(removed)
+        ))
+
+    def get_incremental_build_state(self, test_run, log_name, c89):
+        """Returns the persistent build directory of a test run, and the
+        description of its source tree and toolchain that a previous passing
+        build must match for the test run to be skipped."""
+        platform_toolset = self.get_platform_toolset(test_run, c89)
+        build_dir = os.path.join(
+            self.incremental_build_directory, log_name.replace(" ", "-")
+        )
+        vcvars_path = self.visual_studio_vcvars_path[test_run.vs_version]
+        state = {
+            "source tree": self.get_source_tree_key(),
+            "vcvars": vcvars_path,
+            "vcvars mtime": (os.path.getmtime(vcvars_path)
+                             if os.path.exists(vcvars_path) else None),
+            "platform toolset": platform_toolset,
+            "msbuild": self.msbuild_command,
+        }
+        return build_dir, state
+
+    def load_passing_results(self, build_dir, state):
+        """Returns the results of the last build in build_dir if it passed
+        with the same source tree and toolchain, otherwise None."""
+        results_path = os.path.join(build_dir, ".build_results.json")
+        if state["source tree"] is None or not os.path.isfile(results_path):
+            return None
+        with open(results_path) as f:
+            previous = json.load(f)
+        if previous["state"] != state:
+            return None
+        return previous["results"]
+
+    def save_passing_results(self, build_dir, state, results):
+        results_path = os.path.join(build_dir, ".build_results.json")
+        if os.path.exists(results_path):
+            os.remove(results_path)
+        if state["source tree"] is None or \
+           not all("Pass" in result for result in results.values()):
+            return
+        with open(results_path, "w") as f:
+            json.dump({"state": state, "results": results}, f)
+
+    def prepare_source_trees(self):
+        """This checks out the git reference in a worktree and sets the
+        necessary config once for all test runs, which then build in clones
+        of it. The MinGW clone is taken before generating the source files,
+        which needs Visual Studio."""
+        prepare_logger = self.setup_logger(
+            "Source tree", os.path.join(self.log_dir, "Source tree.txt")
+        )
+        with self.record_step(prepare_logger, "worktree"):
+            self.prepared_tree_path = \
+                self.get_clean_worktree_for_git_reference(prepare_logger)
+        with self.record_step(prepare_logger, "config"):
+            self.set_config_on_code(self.prepared_tree_path, prepare_logger)
+        with self.record_step(prepare_logger, "seedfiles"):
+            self.generate_seedfiles(self.prepared_tree_path)
+        if self.build_mingw:
+            with self.record_step(prepare_logger, "clone"):
+                # make runs in the MinGW clone at the same time as the
+                # Visual Studio builds, so it never shares files with them
+                self.mingw_tree_path = self.clone_prepared_tree(
+                    prepare_logger, allow_links=False
+                )
+        if self.vs_versions_to_build:
+            with self.record_step(prepare_logger, "generate source files"):
+                self.generate_source_files(self.prepared_tree_path,
+                                           prepare_logger)
+
     def test_mingw_built_code(self):
-        """This checks out the git reference in a worktree, sets the necessary
-        config and then builds and tests using MinGW. The result is determined
-        by parsing the output for any test failures."""
+        """This builds and tests the clone of the prepared source tree using
+        MinGW. The result is determined by parsing the output for any test
+        failures."""
         log_name = "MinGW"
         mingw_logger = self.setup_logger(
             log_name, os.path.join(self.log_dir, log_name + ".txt")
         )
-        git_worktree_path = None
+        total = self.start_step(mingw_logger, "total")
         try:
-            git_worktree_path = self.get_clean_worktree_for_git_reference(
-                mingw_logger
-            )
-            self.set_config_on_code(git_worktree_path, mingw_logger)
-            self.generate_seedfiles(git_worktree_path)
             self.mingw_result = self.build_and_test_using_mingw(
-                git_worktree_path, mingw_logger
+                self.mingw_tree_path, mingw_logger
             )
             if not self.mingw_result:
                 self.set_return_code(1)
@@ -331,8 +1045,14 @@ class MbedWindowsTesting(object):
             mingw_logger.error(error)
             traceback.print_exc()
         finally:
-            if git_worktree_path:
-                self.cleanup_git_worktree(git_worktree_path, mingw_logger)
+            with self.record_step(mingw_logger, "cleanup"):
+                self.remove_tree_clone(self.mingw_tree_path)
+            self.mingw_tree_path = None
+            self.end_step(total)
+            self.write_test_run_results(log_name, {
+                "build and test": {None: "Error", True: "Pass",
+                                   False: "Fail"}[self.mingw_result]
+            })
 
     def get_environment_containing_mingw_path(self):
         """This first checks if the mingw command exists on the path,
@@ -350,27 +1070,31 @@ class MbedWindowsTesting(object):
         my_environment["WINDOWS"] = "1"
         logger.info("Building mbed TLS using {}".format(self.mingw_command))
         try:
-            mingw_clean = subprocess.run(
-                [self.mingw_command, "clean"],
-                env=my_environment,
-                encoding=sys.stdout.encoding,
-                cwd=git_worktree_path,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                check=True
-            )
-            logger.info(mingw_clean.stdout)
-            mingw_check = subprocess.run(
-                [self.mingw_command, "CC=gcc", "check"],
-                env=my_environment,
-                encoding=sys.stdout.encoding,
-                cwd=git_worktree_path,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                check=True
-            )
-            logger.info(mingw_check.stdout)
-            if re.search(self.mingw_success_pattern, mingw_check.stdout):
+            with self.record_step(logger, "clean"):
+                self.driver.run_make(
+                    ["clean"], my_environment, git_worktree_path, logger
+                )
+            jobs_flag = "-j{}".format(self.mingw_jobs)
+            if self.mingw_split_check:
+                with self.record_step(logger, "build"):
+                    self.driver.run_make(
+                        [jobs_flag, "CC=gcc", "lib", "tests"],
+                        my_environment, git_worktree_path, logger
+                    )
+                with self.record_step(logger, "test"):
+                    _, matched = self.driver.run_make(
+                        ["CC=gcc", "-C", "tests", "check"],
+                        my_environment, git_worktree_path, logger,
+                        patterns=[self.mingw_success_pattern]
+                    )
+            else:
+                with self.record_step(logger, "check"):
+                    _, matched = self.driver.run_make(
+                        [jobs_flag, "CC=gcc", "check"],
+                        my_environment, git_worktree_path, logger,
+                        patterns=[self.mingw_success_pattern]
+                    )
+            if self.mingw_success_pattern in matched:
                 return True
             else:
                 self.set_return_code(1)
@@ -385,17 +1109,10 @@ class MbedWindowsTesting(object):
         reports all tests passing."""
         logger.info(selftest_dir)
         try:
-            test_output = subprocess.run(
-                [os.path.join(selftest_dir, self.selftest_exe)],
-                cwd=selftest_dir,
-                input="\n",
-                encoding=sys.stdout.encoding,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                check=True
+            _, matched = self.driver.run_selftest(
+                selftest_dir, logger, [self.selftest_success_pattern]
             )
-            logger.info(test_output.stdout)
-            if re.search(self.selftest_success_pattern, test_output.stdout):
+            if self.selftest_success_pattern in matched:
                 return "Pass"
             else:
                 self.set_return_code(1)
@@ -405,38 +1122,69 @@ class MbedWindowsTesting(object):
             logger.error(error.output)
             return "Fail"
 
+    def get_outcome_file_path(self, log_name):
+        return os.path.abspath(
+            os.path.join(self.log_dir, log_name + " outcomes.csv")
+        )
+
     def run_test_suites_on_built_code(self, solution_dir, test_run, logger):
-        """Runs the various test suites and parses the output to check that
-        all the tests pass"""
+        """Runs the test suites with ctest, ctest_jobs of them at a time,
+        and parses the output to record the result and duration of each
+        test suite. The test suites record the outcome of each test case
+        in the same format as on Linux."""
         my_environment = self.get_environment_containing_VSCMD_START_DIR(
             solution_dir
         )
         my_environment["CTEST_OUTPUT_ON_FAILURE"] = "1"
-        msbuild_test_process = subprocess.Popen(
-            ["cmd.exe"],
-            env=my_environment,
-            encoding=sys.stdout.encoding,
-            cwd=solution_dir,
-            stdin=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            stdout=subprocess.PIPE,
+        outcome_file = self.get_outcome_file_path(logger.name)
+        if os.path.exists(outcome_file):
+            os.remove(outcome_file)
+        my_environment["MBEDTLS_TEST_OUTCOME_FILE"] = outcome_file
+        my_environment["MBEDTLS_TEST_PLATFORM"] = "Windows-VS{}-{}".format(
+            test_run.vs_version, test_run.architecture
         )
-        msbuild_test_process.stdin.write("\"{}\" {}\n".format(
-            self.visual_studio_vcvars_path[test_run.vs_version],
-            self.visual_studio_architecture_flags[test_run.architecture]
-        ))
-        msbuild_test_process.stdin.write(
-            "msbuild /nodeReuse:false /p:Configuration={} /m RUN_TESTS.vcxproj\n".format(
-                test_run.configuration
-            )
+        my_environment["MBEDTLS_TEST_CONFIGURATION"] = "cmake_{}{}".format(
+            test_run.configuration,
+            "_retargeted" if test_run.retargeted else ""
+        )
+        test_run.test_suites.clear()
+        def record_test_suite(line):
+            match = self.ctest_result_pattern.search(line)
+            if match:
+                suite, result, duration = match.groups()
+                if result == "Passed":
+                    result = "PASS"
+                elif self.ctest_skip_result_pattern.match(result):
+                    result = "SKIP"
+                else:
+                    result = "FAIL"
+                test_run.test_suites[suite] = (result, float(duration))
+        return_code, matched = self.driver.run_test_suites(
+            solution_dir, test_run, my_environment, logger,
+            [self.test_suites_success_pattern], record_test_suite
         )
-        msbuild_test_process.stdin.close()
-        msbuild_test_output, _ = msbuild_test_process.communicate()
-        logger.info(msbuild_test_output)
-        if (msbuild_test_process.returncode == 0 and
-                all(re.search(x, msbuild_test_output) for x in
-                    [self.test_suites_success_pattern] +
-                    self.visual_studio_build_success_patterns)):
+        failed_suites = [
+            suite for suite, (result, _) in test_run.test_suites.items()
+            if result == "FAIL"
+        ]
+        slowest_suites = sorted(
+            test_run.test_suites.items(), key=lambda item: -item[1][1]
+        )[:self.slowest_test_suites_count]
+        logger.info("Slowest test suites:")
+        for suite, (_, duration) in slowest_suites:
+            logger.info("{:8.2f}s {}".format(duration, suite))
+        for suite, (result, _) in test_run.test_suites.items():
+            if result == "SKIP":
+                logger.info("Test suite not run: {}".format(suite))
+        for suite in failed_suites:
+            logger.error("Test suite failed: {}".format(suite))
+        if not os.path.exists(outcome_file):
+            logger.warning("No test outcomes recorded in {}".format(
+                outcome_file
+            ))
+        if (return_code == 0 and test_run.test_suites and
+                not failed_suites and
+                self.test_suites_success_pattern in matched):
             return "Pass"
         else:
             self.set_return_code(1)
@@ -452,6 +1200,16 @@ class MbedWindowsTesting(object):
         my_environment["VSCMD_START_DIR"] = solution_dir
         return my_environment
 
+    def get_platform_toolset(self, test_run, c89):
+        if test_run.retargeted:
+            return "v{}".format(
+                self.vs_version_toolsets[test_run.vs_version]
+            )
+        elif c89:
+            return "Windows7.1SDK"  # Workaround for missing 2010 x64 tools
+        else:
+            return "v141" # Visual Studio 2017
+
     def build_code_using_visual_studio(self,
                                        solution_dir,
                                        test_run,
@@ -464,14 +1222,7 @@ class MbedWindowsTesting(object):
         my_environment = self.get_environment_containing_VSCMD_START_DIR(
             solution_dir
         )
-        if test_run.retargeted:
-            retarget = "v{}".format(
-                self.vs_version_toolsets[test_run.vs_version]
-            )
-        elif c89:
-            retarget = "Windows7.1SDK"  # Workaround for missing 2010 x64 tools
-        else:
-            retarget = "v141" # Visual Studio 2017
+        retarget = self.get_platform_toolset(test_run, c89)
         logger.info("retarget={}".format(retarget))
         for solution_file in os.listdir(solution_dir):
             if re.match(self.solution_file_pattern, solution_file):
@@ -481,33 +1232,19 @@ class MbedWindowsTesting(object):
             self.set_return_code(1)
             test_run.results[solution_type + " build"] = "Fail"
             return False
-        msbuild_process = subprocess.Popen(
-            ["cmd.exe"],
-            env=my_environment,
-            encoding=sys.stdout.encoding,
-            cwd=solution_dir,
-            stdin=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            stdout=subprocess.PIPE,
+        zero_warnings_pattern = re.escape(
+            self.visual_studio_build_zero_warnings_string
         )
-        msbuild_process.stdin.write("\"{}\" {}\n".format(
-            self.visual_studio_vcvars_path[test_run.vs_version],
-            self.visual_studio_architecture_flags[test_run.architecture]
-        ))
-        msbuild_process.stdin.write(
-            "msbuild /nodeReuse:false /t:Rebuild /p:Configuration={},Platform={},"
-            "PlatformToolset={} /m \"{}\"\n".format(
-                test_run.configuration, test_run.architecture,
-                retarget, solution_file
-            )
+        return_code, matched = self.driver.build_solution(
+            solution_dir, solution_file, test_run, retarget,
+            "Rebuild" if self.incremental_build_directory is None
+            else "Build",
+            my_environment, logger,
+            self.visual_studio_build_success_patterns + [zero_warnings_pattern]
         )
-        msbuild_process.stdin.close()
-        msbuild_output, _ = msbuild_process.communicate()
-        logger.info(msbuild_output)
-        if (msbuild_process.returncode == 0 and
-                all(re.search(x, msbuild_output) for x in
-                    self.visual_studio_build_success_patterns)):
-            if self.visual_studio_build_zero_warnings_string in msbuild_output:
+        if (return_code == 0 and
+                matched.issuperset(self.visual_studio_build_success_patterns)):
+            if zero_warnings_pattern in matched:
                 build_result = "Pass"
             else:
                 build_result = "Pass with warnings"
@@ -523,21 +1260,9 @@ class MbedWindowsTesting(object):
                                                  test_run,
                                                  logger):
         solution_dir = os.path.join(git_worktree_path, "cmake_solution")
-        os.makedirs(solution_dir)
+        os.makedirs(solution_dir, exist_ok=True)
         try:
-            cmake_output = subprocess.run(
-                ["cmake", "-D", "ENABLE_TESTING=ON", "-G",
-                 "{}{}".format(
-                     self.cmake_generators[test_run.vs_version],
-                     self.cmake_architecture_flags[test_run.architecture]),
-                 ".."],
-                cwd=solution_dir,
-                encoding=sys.stdout.encoding,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                check=True
-            )
-            logger.info(cmake_output.stdout)
+            self.driver.generate_cmake_solution(solution_dir, test_run, logger)
             return solution_dir
         except subprocess.CalledProcessError as error:
             self.set_return_code(2)
@@ -564,6 +1289,7 @@ class MbedWindowsTesting(object):
                 cwd=git_worktree_path,
                 env=env,
                 encoding=sys.stdout.encoding,
+                timeout=self.get_timeout(),
                 check=True
             )
         except subprocess.CalledProcessError as error:
@@ -571,37 +1297,60 @@ class MbedWindowsTesting(object):
             logger.error(error.output)
             raise Exception("{} failed, aborting".format(batch_script))
 
-    def test_visual_studio_built_code(self, test_run, solution_type):
-        log_name = "VS{} {} {}{} {}".format(
+    def get_visual_studio_log_name(self, test_run, solution_type):
+        return "VS{} {} {}{} {}".format(
             test_run.vs_version,
             test_run.configuration,
             test_run.architecture,
             " Retargeted" if test_run.retargeted else "",
             solution_type
         )
+
+    def test_visual_studio_built_code(self, test_run, solution_type,
+                                      queued_at=None):
+        log_name = self.get_visual_studio_log_name(test_run, solution_type)
         vs_logger = self.setup_logger(
             log_name, os.path.join(self.log_dir, log_name + ".txt")
         )
+        total = self.start_step(vs_logger, "total", queued_at)
         git_worktree_path = None
+        build_dir = None
         try:
-            git_worktree_path = self.get_clean_worktree_for_git_reference(
-                vs_logger
-            )
-            c89 = self.this_version_forbids_c99(git_worktree_path)
+            c89 = self.this_version_forbids_c99(self.prepared_tree_path)
             if test_run.vs_version == '2010' and not c89:
                 for key in test_run.results:
                     test_run.results[key] = 'Skipped'
                 return
-            self.set_config_on_code(git_worktree_path, vs_logger)
-            self.generate_seedfiles(git_worktree_path)
-            self.generate_source_files(git_worktree_path, vs_logger)
-            if solution_type == "cmake":
-                solution_dir = self.build_visual_studio_solution_using_cmake(
-                    git_worktree_path, test_run, vs_logger
+            if self.incremental_build_directory is not None:
+                build_dir, build_state = self.get_incremental_build_state(
+                    test_run, log_name, c89
                 )
+                previous_results = self.load_passing_results(
+                    build_dir, build_state
+                )
+                if previous_results is not None:
+                    vs_logger.info(
+                        "Skipping, {} passed with the same source tree and "
+                        "toolchain".format(build_dir)
+                    )
+                    test_run.results.update(previous_results)
+                    return
+                with self.record_step(vs_logger, "sync"):
+                    self.sync_source_tree(build_dir, vs_logger)
+                solution_root = build_dir
+            else:
+                with self.record_step(vs_logger, "clone"):
+                    git_worktree_path = self.clone_prepared_tree(vs_logger)
+                solution_root = git_worktree_path
+            if solution_type == "cmake":
+                with self.record_step(vs_logger, "cmake"):
+                    solution_dir = \
+                        self.build_visual_studio_solution_using_cmake(
+                            solution_root, test_run, vs_logger
+                        )
             else:
                 solution_dirs = glob.glob(os.path.join(
-                        git_worktree_path, "visualc", "VS*"))
+                        solution_root, "visualc", "VS*"))
                 if len(solution_dirs) != 1:
                     raise Exception(
                         "Found {} paths matching visualc/VS*, expected exactly one".format(len(solution_dirs))
@@ -612,14 +1361,17 @@ class MbedWindowsTesting(object):
                         "Found file instead of directory when looking "
                         "for VS solution directory: {}".format(solution_dir)
                     )
-            build_result = self.build_code_using_visual_studio(
-                solution_dir, test_run, solution_type, vs_logger, c89
-            )
+            with self.record_step(vs_logger, "build"):
+                build_result = self.build_code_using_visual_studio(
+                    solution_dir, test_run, solution_type, vs_logger, c89
+                )
             if build_result:
                 if solution_type == "cmake":
-                    test_suites_result = self.run_test_suites_on_built_code(
-                        solution_dir, test_run, vs_logger
-                    )
+                    with self.record_step(vs_logger, "test suites"):
+                        test_suites_result = \
+                            self.run_test_suites_on_built_code(
+                                solution_dir, test_run, vs_logger
+                            )
                     test_run.results["cmake test suites"] = test_suites_result
                     selftest_code_path = os.path.join(
                         solution_dir, "programs",
@@ -631,10 +1383,16 @@ class MbedWindowsTesting(object):
                         "x64" if test_run.architecture == "x64" else "",
                         test_run.configuration
                     )
-                selftest_result = self.run_selftest_on_built_code(
-                    selftest_code_path, vs_logger
-                )
+                with self.record_step(vs_logger, "selftest"):
+                    selftest_result = self.run_selftest_on_built_code(
+                        selftest_code_path, vs_logger
+                    )
                 test_run.results[solution_type + " selftest"] = selftest_result
+            if build_dir is not None:
+                self.save_passing_results(build_dir, build_state, {
+                    key: result for key, result in test_run.results.items()
+                    if key.startswith(solution_type + " ")
+                })
         except Exception as error:
             vs_logger.error(error)
             traceback.print_exc()
@@ -642,7 +1400,19 @@ class MbedWindowsTesting(object):
             test_run.run_failed = True
         finally:
             if git_worktree_path:
-                self.cleanup_git_worktree(git_worktree_path, vs_logger)
+                with self.record_step(vs_logger, "cleanup"):
+                    self.remove_tree_clone(git_worktree_path)
+            self.end_step(total)
+            results = OrderedDict(
+                (key, result) for key, result in test_run.results.items()
+                if key.startswith(solution_type + " ")
+            )
+            if test_run.run_failed:
+                results["run"] = "Error"
+            self.write_test_run_results(
+                log_name, results,
+                test_run.test_suites if solution_type == "cmake" else None
+            )
 
     def log_results(self):
         result_logger = self.setup_logger(
@@ -693,16 +1463,130 @@ class MbedWindowsTesting(object):
                     test_run.results["cmake test suites"],
                 ])
             result_logger.info(result_table)
+            for log_name, reason in self.skipped_test_runs:
+                result_logger.info("{} skipped: {}".format(log_name, reason))
+            for test_run in self.vs_test_runs:
+                failed_suites = [
+                    suite for suite, (result, _)
+                    in test_run.test_suites.items() if result == "FAIL"
+                ]
+                if failed_suites:
+                    result_logger.info(
+                        "VS{} {} {}{} failed test suites: {}".format(
+                            test_run.vs_version,
+                            test_run.configuration,
+                            test_run.architecture,
+                            " Retargeted" if test_run.retargeted else "",
+                            ", ".join(failed_suites)
+                        )
+                    )
         result_logger.info(
             "{} configurations tested, {} successful".format(
                 total_test_runs, successful_test_runs
             )
         )
+        with self.timestamps_lock:
+            subtasks = OrderedDict(self.timestamps)
+        with open(os.path.join(self.log_dir, "timestamps.json"), "w") as f:
+            json.dump({"version": 1, "subtasks": subtasks}, f, indent=2)
+
+    def run_with_timeout(self, function, *args):
+        """Runs function on the current thread, applying the time limit of
+        a test run to the commands that it executes."""
+        if self.job_timeout is not None:
+            self.job_state.deadline = time.monotonic() + self.job_timeout
+        try:
+            return function(*args)
+        finally:
+            self.job_state.deadline = None
+
+    def visual_studio_test_failed(self, test_run, solution_type):
+        return test_run.run_failed or any(
+            result == "Fail" for key, result in test_run.results.items()
+            if key.startswith(solution_type + " ")
+        )
+
+    def skip_visual_studio_tests(self, cells, reason):
+        for test_run, solution_type in cells:
+            for key in test_run.results:
+                if (key.startswith(solution_type + " ") and
+                        test_run.results[key] == "Not Run"):
+                    test_run.results[key] = "Skipped"
+            self.skipped_test_runs.append((
+                self.get_visual_studio_log_name(test_run, solution_type),
+                reason
+            ))
+
+    def run_visual_studio_tests(self):
+        """Runs each combination of test run and solution type, up to
+        parallel_jobs of them at a time.
+        With canary_test_runs, the first combination of each Visual Studio
+        version runs first. The other combinations for that version are
+        skipped if it failed for a reason they share: an error in the test
+        run, or a failure to build.
+        With fail_fast, the combinations that have not started yet are
+        skipped as soon as one fails."""
+        cells = [
+            (vs_test_run, solution_type)
+            for vs_test_run in self.vs_test_runs
+            for solution_type in self.visual_studio_solution_types
+        ]
+        # Combinations waiting for the canary of their version
+        held_cells = OrderedDict()
+        if self.canary_test_runs:
+            for cell in cells:
+                held_cells.setdefault(cell[0].vs_version, []).append(cell)
+            cells = [version_cells.pop(0)
+                     for version_cells in held_cells.values()]
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.parallel_jobs) as executor:
+            def submit(cell):
+                future = executor.submit(self.run_with_timeout,
+                                         self.test_visual_studio_built_code,
+                                         cell[0], cell[1],
+                                         self.get_time_ms())
+                running[future] = cell
+            for cell in cells:
+                submit(cell)
+            failed = False
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    test_run, solution_type = running.pop(future)
+                    future.result()
+                    cell_failed = self.visual_studio_test_failed(
+                        test_run, solution_type
+                    )
+                    failed = failed or cell_failed
+                    version_cells = held_cells.pop(test_run.vs_version, [])
+                    if cell_failed and (
+                            test_run.run_failed or
+                            test_run.results[solution_type + " build"] ==
+                            "Fail"):
+                        self.skip_visual_studio_tests(
+                            version_cells,
+                            "{} failed".format(self.get_visual_studio_log_name(
+                                test_run, solution_type
+                            ))
+                        )
+                    elif failed and self.fail_fast:
+                        self.skip_visual_studio_tests(version_cells,
+                                                      "fail fast")
+                    else:
+                        for cell in version_cells:
+                            submit(cell)
+                if failed and self.fail_fast:
+                    for future, cell in list(running.items()):
+                        if future.cancel():
+                            del running[future]
+                            self.skip_visual_studio_tests([cell], "fail fast")
+                    for version_cells in held_cells.values():
+                        self.skip_visual_studio_tests(version_cells,
+                                                      "fail fast")
+                    held_cells.clear()
 
     def run_all_tests(self):
         try:
-            if self.build_mingw:
-                self.test_mingw_built_code()
             if self.vs_versions_to_build:
                 self.vs_test_runs = [
                     VStestrun(vs_version, configuration,
@@ -714,17 +1598,36 @@ class MbedWindowsTesting(object):
                     ((vs_version, architecture) != ("2010", "x64") and
                      (vs_version, retargeted) != ("2010", True))
                 ]
-                for vs_test_run in self.vs_test_runs:
-                    for solution_type in self.visual_studio_solution_types:
-                        self.test_visual_studio_built_code(
-                            vs_test_run, solution_type
-                        )
+            if self.build_mingw or self.vs_versions_to_build:
+                self.run_with_timeout(self.prepare_source_trees)
+            # MinGW builds in its own clone, alongside the Visual Studio
+            # test runs
+            with ThreadPoolExecutor(max_workers=1) as mingw_executor:
+                if self.build_mingw:
+                    mingw_future = mingw_executor.submit(
+                        self.run_with_timeout, self.test_mingw_built_code
+                    )
+                if self.vs_versions_to_build:
+                    self.run_visual_studio_tests()
+                if self.build_mingw:
+                    mingw_future.result()
         except Exception:
             traceback.print_exc()
             self.set_return_code(2)
+            for test_run in self.vs_test_runs:
+                test_run.run_failed = True
         finally:
-            self.log_results()
-            sys.exit(self.return_code)
+            try:
+                if self.mingw_tree_path:
+                    self.remove_tree_clone(self.mingw_tree_path)
+                if self.prepared_tree_path:
+                    self.cleanup_git_worktree(
+                        self.prepared_tree_path,
+                        logging.getLogger("Source tree")
+                    )
+            finally:
+                self.log_results()
+                sys.exit(self.return_code)
 
 
 def run_main():
@@ -752,6 +1655,23 @@ def run_main():
         "-c", "--configuration-file", type=str,
         help="optional path to a json file for non-default testing"
     )
+    parser.add_argument(
+        "-j", "--jobs", type=int,
+        help="how many test runs to execute concurrently (default: 1)"
+    )
+    parser.add_argument(
+        "-t", "--job-timeout", type=float,
+        help="time limit in seconds for each test run (default: none)"
+    )
+    parser.add_argument(
+        "--canary", action="store_true", default=None,
+        help="run one test run per Visual Studio version first, and skip "
+             "the others for that version if it fails to build"
+    )
+    parser.add_argument(
+        "--fail-fast", action="store_true", default=None,
+        help="do not start new test runs once one has failed"
+    )
 
     windows_testing_args = parser.parse_args()
     if windows_testing_args.configuration_file is not None:
@@ -759,6 +1679,14 @@ def run_main():
             testing_config = json.load(f)
     else:
         testing_config = {}
+    if windows_testing_args.jobs is not None:
+        testing_config["parallel_jobs"] = windows_testing_args.jobs
+    if windows_testing_args.job_timeout is not None:
+        testing_config["job_timeout"] = windows_testing_args.job_timeout
+    if windows_testing_args.canary is not None:
+        testing_config["canary_test_runs"] = True
+    if windows_testing_args.fail_fast is not None:
+        testing_config["fail_fast"] = True
     mbed_test = MbedWindowsTesting(
         windows_testing_args.repo_path,
         windows_testing_args.log_path,